@@ -0,0 +1,90 @@
+"""Compact in-memory records of the measurement catalog.
+
+A parsed catalog item is a dict holding its keys, a hash table and its own
+copy of every value string. A CatalogItem keeps the values of the known
+keys in slots instead, and the strings of a whole catalog are interned
+while it is built (see build_catalog, which converts every record as soon
+as it is parsed). The few distinct domains, characteristics, answer sets
+and sources are then shared by all items instead of being repeated in
+each of them.
+
+CatalogItem is a read-only Mapping under the original (Hebrew) keys, so
+item['תחום'] and item.get('מקור', default) work as they do on the dict.
+"""
+from collections.abc import Mapping
+
+# Catalog JSON key -> CatalogItem slot
+FIELDS = {
+    'תחום': 'domain',
+    'מאפיין': 'characteristic',
+    'התנהגות / עמדות / ידע': 'dimension',
+    'סעיף / היגד על': 'survey_item',
+    'פריט/היגד מקורי': 'original_item',
+    'תשובות אפשריות': 'answers',
+    'אופן חישוב המדד': 'measurement_method',
+    'מקור': 'source',
+    'קישור': 'link',
+    'הערות': 'notes',
+    'גרף': 'chart',
+}
+KEYS = {slot: key for key, slot in FIELDS.items()}
+
+
+class CatalogItem(Mapping):
+    """One catalog item, stored in slots and read like the parsed JSON dict.
+
+    Slots of keys the item lacks stay unset; keys outside FIELDS are kept in
+    the extra dict (None when there are none).
+    """
+
+    __slots__ = tuple(FIELDS.values()) + ('extra',)
+
+    def __init__(self, record, strings=None):
+        """Build from a parsed record; strings, when given, interns the string values across items."""
+        if strings is None:
+            strings = {}
+        extra = None
+        for key, value in record.items():
+            if isinstance(value, str):
+                value = strings.setdefault(value, value)
+            slot = FIELDS.get(key)
+            if slot is not None:
+                setattr(self, slot, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[strings.setdefault(key, key)] = value
+        self.extra = extra
+
+    @property
+    def combined_metric(self):
+        """Characteristic and behavior / attitude / knowledge, e.g. "ניהול מידע - ידע"."""
+        return self.characteristic + " - " + self.dimension
+
+    def __getitem__(self, key):
+        slot = FIELDS.get(key)
+        if slot is not None:
+            try:
+                return getattr(self, slot)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for slot, key in KEYS.items():
+            if hasattr(self, slot):
+                yield key
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"CatalogItem({dict(self)!r})"
+
+    def __reduce__(self):
+        # Pickled (e.g. for the export pool) as the plain record
+        return CatalogItem, (dict(self),)
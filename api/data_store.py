@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+from .snapshot import load_snapshot
+
+# Directory holding the dashboard's JSON data files
+DATA_DIR = os.environ.get('SKILLS_DATA_DIR', 'public')
+
+# Immutable, columnar view of one parsed data file.
+#   path    - the file the snapshot was parsed from (unique across dataset directories)
+#   version - (mtime_ns, size) of that file
+#   columns - read-only mapping of column name -> tuple of values
+#   index   - tuple of values of the index column (the y-axis categories)
+#   matrix  - read-only 2-D float array (index x columns), or None for non-numeric files
+#   column_index - read-only mapping of column name -> matrix column position
+TableSnapshot = namedtuple('TableSnapshot', ['name', 'path', 'version', 'columns', 'index', 'matrix', 'column_index'])
+
+# Every DerivedTables instance, for discard_derived
+_derived_tables = []
+
+# Called whenever something is loaded into memory: a table parsed, a derived table or figure built
+# (the dataset registry checks its memory budget then; see api/datasets.py)
+growth_listeners = []
+
+
+def notify_growth():
+    for listener in growth_listeners:
+        listener()
+
+
+def file_version(path):
+    """Cheap change marker for a file: its modification time and size."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_table(name, path, index_column, version):
+    """Parse a list-of-records JSON file into a TableSnapshot.
+
+    A fresh compiled snapshot of the data directory is used instead of the
+    JSON file when one exists (see api/snapshot.py).
+    """
+    data_dir = os.path.dirname(path)
+    compiled = load_snapshot(data_dir)
+    if compiled is not None and compiled.has(name) and compiled.is_fresh(name, data_dir):
+        columns, index, matrix = compiled.table(name, index_column)
+    else:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        columns = {key: tuple(row[key] for row in data) for key in data[0]}
+        index = columns.pop(index_column, None)
+        try:
+            matrix = np.ascontiguousarray(np.array(list(columns.values()), dtype=float).T)
+            matrix.setflags(write=False)
+        except (TypeError, ValueError):
+            matrix = None
+    column_index = MappingProxyType({key: i for i, key in enumerate(columns)})
+    return TableSnapshot(name, path, version, MappingProxyType(columns), index, matrix, column_index)
+
+
+def select_columns(snapshot, selected_columns):
+    """Return (column_names, matrix) for the selected columns (all columns when none are selected)."""
+    if selected_columns:
+        column_names = list(selected_columns)
+        return column_names, snapshot.matrix[:, [snapshot.column_index[key] for key in column_names]]
+    return list(snapshot.columns), snapshot.matrix
+
+
+def mask_range(matrix, value_range):
+    """New float array with NaN for every value outside [min_val, max_val], which Plotly renders as a gap."""
+    min_val, max_val = value_range
+    return np.where((matrix >= min_val) & (matrix <= max_val), matrix, np.nan)
+
+
+class DerivedTables:
+    """Objects derived from TableSnapshots (label tables, row groups, ...), built once per data version.
+
+    Entries are keyed by the snapshot's path, so the same file name in
+    different dataset directories does not collide.
+    """
+
+    def __init__(self, build):
+        self.build = build
+        self._entries = {}
+        self._lock = threading.Lock()
+        _derived_tables.append(self)
+
+    def get(self, snapshot):
+        entry = self._entries.get(snapshot.path)
+        if entry is not None and entry[0] == snapshot.version:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(snapshot.path)
+            if entry is None or entry[0] != snapshot.version:
+                entry = (snapshot.version, self.build(snapshot))
+                self._entries[snapshot.path] = entry
+                notify_growth()
+        return entry[1]
+
+    def values(self, data_dir):
+        """Current entries built from the files of data_dir."""
+        return [value for path, (_, value) in list(self._entries.items()) if os.path.dirname(path) == data_dir]
+
+    def discard(self, data_dir):
+        with self._lock:
+            for path in [path for path in self._entries if os.path.dirname(path) == data_dir]:
+                del self._entries[path]
+
+
+def derived_values(data_dir):
+    """Everything derived from the files of data_dir, across all DerivedTables."""
+    return [value for tables in _derived_tables for value in tables.values(data_dir)]
+
+
+def discard_derived(data_dir):
+    """Drop everything derived from the files of data_dir (when its dataset is unloaded)."""
+    for tables in _derived_tables:
+        tables.discard(data_dir)
+
+
+class DataStore:
+    """Parses each data file once and re-reads it only when its mtime or size changes."""
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        # Set while a background watcher refreshes changed files (see api.reload)
+        self.watched = False
+        self.parses = 0
+        self.hits = 0
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def table(self, name, index_column='נושא'):
+        """Return the current TableSnapshot of a data file, parsing it only if it changed."""
+        key = (name, index_column)
+        snapshot = self._snapshots.get(key)
+        # A watched store is refreshed off the request path: serve the current snapshot without a stat
+        if snapshot is not None and self.watched:
+            self.hits += 1
+            return snapshot
+
+        path = self.path(name)
+        version = file_version(path)
+        if snapshot is not None and snapshot.version == version:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            # Another thread may have parsed the same version while we waited
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and snapshot.version == version:
+                self.hits += 1
+                return snapshot
+            snapshot = parse_table(name, path, index_column, version)
+            self._snapshots[key] = snapshot
+            self.parses += 1
+        notify_growth()
+        return snapshot
+
+    def refresh(self):
+        """Re-parse every loaded table whose file changed, then swap it in; return the names refreshed.
+
+        Parsing happens outside the lock, so readers keep getting the previous
+        snapshot until the new one is complete.
+        """
+        refreshed = []
+        for (name, index_column), snapshot in list(self._snapshots.items()):
+            path = self.path(name)
+            version = file_version(path)
+            if version == snapshot.version:
+                continue
+            updated = parse_table(name, path, index_column, version)
+            with self._lock:
+                self._snapshots[(name, index_column)] = updated
+                self.parses += 1
+            refreshed.append(name)
+        if refreshed:
+            notify_growth()
+        return refreshed
+
+    def snapshots(self):
+        """The currently loaded TableSnapshots."""
+        return list(self._snapshots.values())
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def stats(self):
+        return {
+            'files': sorted(name for name, _ in self._snapshots),
+            'parses': self.parses,
+            'hits': self.hits,
+        }
+
+
+store = DataStore()
@@ -0,0 +1,254 @@
+"""Several datasets (survey waves, populations) served from one process.
+
+A dataset is a directory holding the dashboard's data files. The one in
+SKILLS_DATA_DIR is served by default; every subdirectory of
+SKILLS_DATASETS_DIR that holds example.json is another dataset, named after
+the directory and picked with ?dataset=<name> or the sidebar dropdown.
+
+Datasets are loaded on first use, each with its own data store, catalog,
+derived tables and heatmap figure cache. Whenever a dataset is loaded or
+something is added to one of them, the next lookup checks the estimated size
+of all loaded datasets; over DATASET_MEMORY_BUDGET the least recently used
+ones are unloaded, and they load again on their next use. Lookups of loaded
+datasets otherwise take no lock and measure nothing, and neither does
+/metrics, which reports the size found by the last check.
+
+The default dataset is preloaded, shared by the workers (see
+gunicorn.conf.py), hot-reloaded by the data watcher and never unloaded. The
+others pick up changed files when they are accessed, like an unwatched
+DataStore.
+"""
+import logging
+import itertools
+import os
+import re
+import sys
+import threading
+from types import MappingProxyType
+
+import numpy as np
+
+from .data_store import (DATA_DIR, DataStore, derived_values, discard_derived, file_version, growth_listeners,
+                         notify_growth, store)
+from .figure_cache import FigureCache, heatmap_cache
+from .figures_map import CATALOG_FILE, build_catalog, current_catalog
+from .snapshot import forget_snapshot
+
+DATASETS_DIR = os.environ.get('SKILLS_DATASETS_DIR', '')
+DEFAULT_DATASET = os.environ.get('SKILLS_DEFAULT_DATASET', 'default')
+# Estimated bytes of all loaded datasets (the default included) above which the least recently used are unloaded
+DATASET_MEMORY_BUDGET = int(os.environ.get('DATASET_MEMORY_BUDGET', 1024 * 1024 * 1024))
+
+HEATMAP_FILE = 'example.json'
+DATASET_NAME = re.compile(r'[\w-][\w.-]*')
+
+# Containers longer than this are sized from an evenly spaced sample of their items
+SIZE_SAMPLE = 256
+
+
+def approximate_size(obj, seen=None):
+    """Rough deep size in bytes of parsed data: dicts, sequences, slotted records, strings, numbers and arrays."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (dict, MappingProxyType)):
+        items = [element for pair in obj.items() for element in pair]
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        items = list(obj)
+    elif getattr(type(obj), '__slots__', None):
+        items = [getattr(obj, slot) for slot in type(obj).__slots__ if hasattr(obj, slot)]
+    else:
+        return size
+    if len(items) <= SIZE_SAMPLE:
+        return size + sum(approximate_size(item, seen) for item in items)
+    sample = items[::len(items) // SIZE_SAMPLE]
+    return size + sum(approximate_size(item, seen) for item in sample) * len(items) // len(sample)
+
+
+class Dataset:
+    """One dataset directory with its data store, catalog and heatmap figure cache.
+
+    catalog_source, when given, returns the catalog instead of the dataset
+    loading its own; such a dataset (the default) is pinned and never unloaded.
+    """
+
+    def __init__(self, name, data_dir, data_store=None, figures=None, catalog_source=None):
+        self.name = name
+        self.data_dir = data_dir
+        self.store = data_store or DataStore(data_dir)
+        self.figures = figures or FigureCache()
+        self.pinned = catalog_source is not None
+        # Tick of the registry's use clock at the last lookup, for least recently used unloading
+        self.last_used = 0
+        self._catalog_source = catalog_source
+        self._catalog = None
+        self._catalog_lock = threading.Lock()
+        # id -> (object, bytes), so every loaded object is measured once
+        self._sizes = {}
+
+    def table(self, name=HEATMAP_FILE):
+        return self.store.table(name)
+
+    def catalog(self):
+        """Current Catalog of the dataset, built on first use and rebuilt when its file changes."""
+        if self._catalog_source is not None:
+            return self._catalog_source()
+        version = file_version(os.path.join(self.data_dir, CATALOG_FILE))
+        catalog = self._catalog
+        if catalog is not None and catalog.version == version:
+            return catalog
+        with self._catalog_lock:
+            if self._catalog is None or self._catalog.version != version:
+                self._catalog = build_catalog(self.data_dir)
+                notify_growth()
+            return self._catalog
+
+    def loaded_catalog(self):
+        """The catalog if it is loaded, without loading it."""
+        return self._catalog_source() if self._catalog_source is not None else self._catalog
+
+    def nbytes(self):
+        """Estimated bytes held: tables, derived tables, catalog items and cached figures."""
+        objects = self.store.snapshots() + derived_values(self.data_dir)
+        total = self.figures.nbytes
+        catalog = self.loaded_catalog()
+        if catalog is not None:
+            objects.append(catalog.data)
+            total += catalog.figure_map.nbytes
+
+        sizes = {}
+        for obj in objects:
+            cached = self._sizes.get(id(obj))
+            if cached is None or cached[0] is not obj:
+                cached = (obj, approximate_size(obj))
+            sizes[id(obj)] = cached
+        self._sizes = sizes
+        return total + sum(size for _, size in sizes.values())
+
+    def unload(self):
+        """Drop everything loaded; the dataset loads again on its next use."""
+        self.store.clear()
+        self.figures.clear()
+        with self._catalog_lock:
+            self._catalog = None
+        self._sizes = {}
+        discard_derived(self.data_dir)
+        forget_snapshot(self.data_dir)
+
+
+class DatasetRegistry:
+    """Datasets by name, loaded on first use and unloaded least recently used first over the budget."""
+
+    def __init__(self, default, datasets_dir=DATASETS_DIR, budget=DATASET_MEMORY_BUDGET):
+        self.default = default
+        self.datasets_dir = datasets_dir
+        self.budget = budget
+        self.evictions = 0
+        # Estimated bytes of the loaded datasets at the last budget check
+        self.nbytes = 0
+        self._datasets = {default.name: default}
+        # Cache counters of unloaded datasets, so the totals over all datasets never go back
+        self._retired = {'data_store': {'hits': 0, 'parses': 0}, 'heatmap_figures': {'hits': 0, 'misses': 0}}
+        # Guards _retired and removals from _datasets against a concurrent cache_stats(); never held while measuring
+        self._stats_lock = threading.Lock()
+        self._uses = itertools.count(1)
+        # Set when a dataset loaded or grew; the next get() checks the budget
+        self._grown = False
+        self._lock = threading.Lock()
+        growth_listeners.append(self._mark_grown)
+
+    def _mark_grown(self):
+        self._grown = True
+
+    def data_dir(self, name):
+        """Directory of a named dataset other than the default, or None if there is none."""
+        if not self.datasets_dir or not DATASET_NAME.fullmatch(name):
+            return None
+        data_dir = os.path.join(self.datasets_dir, name)
+        return data_dir if os.path.isfile(os.path.join(data_dir, HEATMAP_FILE)) else None
+
+    def names(self):
+        """Names of all datasets that can be served, the default first."""
+        names = [self.default.name]
+        if self.datasets_dir:
+            try:
+                entries = sorted(os.listdir(self.datasets_dir))
+            except OSError as e:
+                logging.error(f"Error listing datasets in {self.datasets_dir}: {e}")
+                entries = []
+            names += [entry for entry in entries if entry != self.default.name and self.data_dir(entry)]
+        return names
+
+    def get(self, name=None):
+        """The named dataset (the default for None or ''), now the most recently used; KeyError if unknown."""
+        name = name or self.default.name
+        dataset = self._datasets.get(name)
+        if dataset is None:
+            with self._lock:
+                dataset = self._datasets.get(name)
+                if dataset is None:
+                    data_dir = self.data_dir(name)
+                    if data_dir is None:
+                        raise KeyError(name)
+                    dataset = self._datasets[name] = Dataset(name, data_dir)
+                    self._grown = True
+        dataset.last_used = next(self._uses)
+        if self._grown:
+            with self._lock:
+                if self._grown:
+                    self._grown = False
+                    self._enforce_budget(keep=name)
+        return dataset
+
+    def _enforce_budget(self, keep):
+        """Unload least recently used datasets other than keep until the loaded ones fit the budget (lock held)."""
+        sizes = {name: dataset.nbytes() for name, dataset in self._datasets.items()}
+        total = sum(sizes.values())
+        for dataset in sorted(self._datasets.values(), key=lambda dataset: dataset.last_used):
+            if total <= self.budget:
+                break
+            if dataset.pinned or dataset.name == keep or not sizes[dataset.name]:
+                continue
+            with self._stats_lock:
+                for kind, stats in self._cache_stats(dataset).items():
+                    retired = self._retired[kind]
+                    for key in retired:
+                        retired[key] += stats.get(key, 0)
+                del self._datasets[dataset.name]
+            dataset.unload()
+            total -= sizes[dataset.name]
+            self.evictions += 1
+            logging.info(f"Unloaded dataset {dataset.name} ({sizes[dataset.name]} bytes) to stay within the memory budget")
+        self.nbytes = total
+
+    @staticmethod
+    def _cache_stats(dataset):
+        return {'data_store': dataset.store.stats(), 'heatmap_figures': dataset.figures.stats()}
+
+    def cache_stats(self, kind):
+        """Hit and miss (or parse) counts of one kind of cache ('data_store', 'heatmap_figures') over all datasets."""
+        with self._stats_lock:
+            totals = dict(self._retired[kind])
+            loaded = list(self._datasets.values())
+        for dataset in loaded:
+            stats = self._cache_stats(dataset)[kind]
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        return totals
+
+    def stats(self):
+        """Loaded datasets, their bytes at the last budget check, the budget and unloads so far; measures nothing."""
+        return {
+            'loaded': list(self._datasets),
+            'bytes': self.nbytes,
+            'budget': self.budget,
+            'evictions': self.evictions,
+        }
+
+
+datasets = DatasetRegistry(Dataset(DEFAULT_DATASET, DATA_DIR, store, heatmap_cache, current_catalog))
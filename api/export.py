@@ -0,0 +1,178 @@
+"""Batch export of the heatmap and every cell chart as one zip archive.
+
+Cell figures are built and rendered in a process pool and written to the
+archive in a fixed order as soon as each one is ready, so the download
+starts streaming while later charts are still rendering. A finished
+archive is kept on disk per dataset, data version and format and served
+as-is until the data changes.
+
+Charts are exported as images (png by default, svg, pdf) rendered by
+kaleido, which is pinned in requirements.txt. Only when kaleido cannot be
+imported are they exported as standalone HTML files instead.
+"""
+import concurrent.futures
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import zipfile
+
+import plotly.io as pio
+
+from .figures_map import MOCK_SEED, build_cell_entry
+
+try:
+    import kaleido  # noqa: F401
+    IMAGE_FORMATS = ('png', 'svg', 'pdf')
+except ImportError:
+    logging.warning("kaleido is not installed; chart export falls back to HTML")
+    IMAGE_FORMATS = ()
+
+EXPORT_FORMATS = IMAGE_FORMATS + ('html',)
+DEFAULT_FORMAT = EXPORT_FORMATS[0]
+
+# Renderer processes; 0 renders in the calling thread
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', os.cpu_count() or 1))
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'skills-export'))
+
+# Already compressed formats are stored, text formats deflated
+COMPRESSION = {'png': zipfile.ZIP_STORED, 'pdf': zipfile.ZIP_STORED}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render_figure(figure_json, fmt):
+    """Bytes of one serialized figure in the given export format."""
+    figure = json.loads(figure_json)
+    if fmt == 'html':
+        return pio.to_html(figure, include_plotlyjs='cdn', full_html=True, validate=False).encode('utf-8')
+    return pio.to_image(figure, format=fmt, validate=False)
+
+
+def render_cell(job):
+    """Build and render one cell in a pool process: (arcname, bytes)."""
+    arcname, row, col, items, fmt = job
+    return arcname, render_figure(build_cell_entry(row, col, items).figure_json, fmt)
+
+
+def safe_name(text):
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', text).strip('_') or '_'
+
+
+def cell_jobs(catalog, fmt):
+    """Render jobs of every catalog cell, in archive order."""
+    return [
+        (f"cells/{safe_name(row)}/{safe_name(col)}.{fmt}", row, col, items, fmt)
+        for row in catalog.rows
+        for col, items in sorted(catalog.cell_items[row].items())
+    ]
+
+
+def executor():
+    """Process pool shared by all exports of this server process, started on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # forkserver: safe to start from a threaded server; the pool processes
+            # import the catalog once, in the fork server
+            context = multiprocessing.get_context('forkserver' if os.name == 'posix' else 'spawn')
+            if os.name == 'posix':
+                context.set_forkserver_preload([__name__])
+            _executor = concurrent.futures.ProcessPoolExecutor(EXPORT_WORKERS, mp_context=context)
+        return _executor
+
+
+def rendered_cells(jobs):
+    """Yield (arcname, bytes) of every job, in order, as soon as each is ready."""
+    if EXPORT_WORKERS <= 0:
+        yield from map(render_cell, jobs)
+        return
+    chunksize = max(1, len(jobs) // (EXPORT_WORKERS * 8))
+    yield from executor().map(render_cell, jobs, chunksize=chunksize)
+
+
+class _StreamBuffer:
+    """Write-only file object collecting zip output between yields."""
+
+    def __init__(self, mirror):
+        self.position = 0
+        self.chunks = []
+        self.mirror = mirror
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.mirror.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def cache_path(version, fmt, dataset):
+    key = hashlib.sha1(repr((MOCK_SEED, version)).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(EXPORT_CACHE_DIR, dataset, f"export-{key}.{fmt}.zip")
+
+
+def publish(tmp_path, path, fmt):
+    """Move a complete archive into place and drop the dataset's archives of older data versions."""
+    os.replace(tmp_path, path)
+    for stale in glob.glob(os.path.join(os.path.dirname(path), f"export-*.{fmt}.zip")):
+        if stale != path:
+            try:
+                os.unlink(stale)
+            except OSError:
+                pass
+
+
+def stream_export(catalog, heatmap_figure, version, fmt=DEFAULT_FORMAT, dataset='default'):
+    """Yield the bytes of the export archive, from the cache or while it is being built.
+
+    heatmap_figure is called (only when the archive is built) for the heatmap
+    figure as JSON. version identifies the data of the dataset the archive is
+    built from; a complete archive is kept under both and later requests
+    stream that file.
+    """
+    path = cache_path(version, fmt, dataset)
+    try:
+        cached = open(path, 'rb')
+    except FileNotFoundError:
+        cached = None
+    if cached is not None:
+        with cached:
+            yield from iter(lambda: cached.read(1 << 16), b'')
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            stream = _StreamBuffer(tmp)
+            with zipfile.ZipFile(stream, 'w', compression=COMPRESSION.get(fmt, zipfile.ZIP_DEFLATED)) as archive:
+                archive.writestr(f"heatmap.{fmt}", render_figure(heatmap_figure(), fmt))
+                yield stream.drain()
+                for arcname, content in rendered_cells(cell_jobs(catalog, fmt)):
+                    archive.writestr(arcname, content)
+                    yield stream.drain()
+            yield stream.drain()
+        # Publish only complete archives; a concurrent export of the same version may win the rename
+        publish(tmp.name, path, fmt)
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            logging.error(f"Error building export {path}: {e}")
+        os.unlink(tmp.name)
+        raise
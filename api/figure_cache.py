@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from .data_store import notify_growth
+
+# Limits of the rendered heatmap cache: number of entries and total serialized bytes
+HEATMAP_CACHE_SIZE = int(os.environ.get('HEATMAP_CACHE_SIZE', 128))
+HEATMAP_CACHE_BYTES = int(os.environ.get('HEATMAP_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+class FigureCache:
+    """LRU cache of serialized figures, bounded by entry count and total JSON size.
+
+    Entries belong to one data version; storing or reading with a different
+    version drops everything cached for the previous one.
+    """
+
+    def __init__(self, maxsize=HEATMAP_CACHE_SIZE, max_bytes=HEATMAP_CACHE_BYTES):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.version = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def get(self, version, key):
+        """Return the cached figure dict for key, or None. The dict must not be mutated."""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version, key, figure):
+        """Serialize a figure once, cache the plain dict and return it."""
+        serialized = pio.to_json(figure, validate=False)
+        figure_dict = json.loads(serialized)
+        size = len(serialized)
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                return figure_dict
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            self._entries[key] = (figure_dict, size)
+            self.nbytes += size
+            while len(self._entries) > self.maxsize or self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+        notify_growth()
+        return figure_dict
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+heatmap_cache = FigureCache()
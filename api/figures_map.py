@@ -1,7 +1,36 @@
+import plotly.colors
 import plotly.graph_objects as go
+import plotly.io as pio
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from types import MappingProxyType
 import random
+import hashlib
 import json
+import os
 import re
+import threading
+
+import numpy as np
+
+from .catalog_items import CatalogItem
+from .data_store import DATA_DIR, file_version, notify_growth
+from .snapshot import load_snapshot
+from .synthetic import randomize_numeric
+
+CATALOG_FILE = 'measurement_map.json'
+
+# Seed of the mock chart values, shared by all workers so they render identical charts
+MOCK_SEED = int(os.environ.get('MOCK_SEED', 0))
+
+# Maximum number of cell figures kept alive by the lazy figure map
+FIGURE_CACHE_SIZE = int(os.environ.get('FIGURE_CACHE_SIZE', 64))
+
+# Define a safe color palette as fallback
+SAFE_COLORS = [
+    '#88CCEE', '#44AA99', '#117733', '#332288', '#DDCC77',
+    '#999933', '#CC6677', '#882255', '#AA4499', '#DDDDDD'
+]
 
 def extract_bracketed_values(text):
     match = re.search(r"\[(.*?)\]", text)
@@ -13,15 +42,13 @@ def extract_bracketed_values(text):
         return None
     
 
-def update_json_with_random(filepath):
+def update_json_with_random(filepath, seed=None):
     try:
         with open(filepath, 'r', encoding='utf-8') as f:  # Ensure UTF-8 encoding for Hebrew
             data = json.load(f)
 
-        for item in data:
-            for key, value in item.items():
-                if isinstance(value, int):  # Check if the value is an integer (numeric)
-                    item[key] = random.randint(0, 10)
+        # Re-randomize every integer (numeric) value; a seed makes the result reproducible
+        randomize_numeric(data, np.random.default_rng(seed))
 
         with open(filepath, 'w', encoding='utf-8') as f:  # Overwrite the file
             json.dump(data, f, indent=4, ensure_ascii=False)  # Preserve Hebrew characters
@@ -36,42 +63,46 @@ def update_json_with_random(filepath):
 
 
 
-# Load the measurement data from JSON file
-with open("public/measurement_map.json", encoding="utf-8") as f:
-    data = json.load(f)
-    for item in data:
-            for key, value in item.items():
-                if isinstance(value, int):  # Check if the value is an integer (numeric)
-                    item[key] = random.randint(0, 10)
-
+def load_catalog(data_dir=DATA_DIR, convert=None):
+    """Catalog items of measurement_map.json, from the compiled snapshot when it is fresh.
 
-# Combine relevant columns for unique metric identification and prepare the data
-data = [
-    {
-        **item,
-        'combined_metric': item['מאפיין'] + " - " + item['התנהגות / עמדות / ידע']
-    }
-    for item in data
-]
+    convert, when given, replaces each (flat) record as soon as it is parsed,
+    so the parsed dicts are never all alive at once.
+    """
+    compiled = load_snapshot(data_dir)
+    if compiled is not None and compiled.has(CATALOG_FILE) and compiled.is_fresh(CATALOG_FILE, data_dir):
+        records = compiled.iter_records(CATALOG_FILE)
+        return list(records if convert is None else map(convert, records))
+    with open(os.path.join(data_dir, CATALOG_FILE), encoding="utf-8") as f:
+        return json.load(f, object_hook=convert)
 
-# Define the fixed rows and columns
-rows = sorted(set(item['תחום'] for item in data))
-cols = sorted(
-    set(f"{item['מאפיין']} {item['התנהגות / עמדות / ידע']}".strip()
-        for item in data)
-)
 
 # Function to normalize keys to ensure consistency (e.g., trim spaces, unify cases)
 def normalize(txt):
     return re.sub(r"\s+", " ", txt).replace('\u200f', '').strip()
 
+def metric_key(item):
+    """Column key of a catalog item: characteristic followed by behavior / attitude / knowledge."""
+    return normalize(f"{item['מאפיין']} {item['התנהגות / עמדות / ידע']}")
+
+def build_catalog_index(items):
+    """Group catalog items by normalized domain and metric in a single pass.
+
+    Returns {domain: {metric: [item, ...]}}, keeping every item of a cell in
+    catalog order.
+    """
+    index = {}
+    for item in items:
+        index.setdefault(normalize(item['תחום']), {}).setdefault(metric_key(item), []).append(item)
+    return index
+
 # Function to generate a mock bar chart
-def generate_dynamic_figure(x, y, values):
+def generate_dynamic_figure(x, y, values, rng=random):
     if values:
         categories = values
     else:
         categories = ['Category A', 'Category B', 'Category C', 'Category D']  # Default if no values
-    values_counts = [random.randint(5, 30) for _ in categories] # Mock values
+    values_counts = [rng.randint(5, 30) for _ in categories] # Mock values
     fig = go.Figure(data=[
         go.Bar(
             x=categories,  # Use the provided values
@@ -87,13 +118,13 @@ def generate_dynamic_figure(x, y, values):
     )
     return fig
 
-def generate_pie_chart(x, y, values):  # Add 'values' as a parameter
+def generate_pie_chart(x, y, values, rng=random):  # Add 'values' as a parameter
     if values:
         labels = values
     else:
         labels = ['Section A', 'Section B', 'Section C', 'Section D'] # Default
 
-    values_counts = [random.randint(5, 30) for _ in labels] # Mock data
+    values_counts = [rng.randint(5, 30) for _ in labels] # Mock data
     fig = go.Figure(data=[go.Pie(labels=labels, values=values_counts, hole=.3)])
     fig.update_layout(  # ... (rest of layout code)
         #  title=f"{x} - {y}",  # Use x and y in the title
@@ -103,13 +134,13 @@ def generate_pie_chart(x, y, values):  # Add 'values' as a parameter
 
 
 
-def generate_scatter_plot(x, y, values):
+def generate_scatter_plot(x, y, values, rng=random):
     if values:  # Use values if available, otherwise default to random values
         x_values = values
     else:
-        x_values = [random.random() for _ in range(20)]
+        x_values = [rng.random() for _ in range(20)]
     
-    y_values = [random.random() for _ in range(20)] # Mock data
+    y_values = [rng.random() for _ in range(20)] # Mock data
 
     fig = go.Figure(data=go.Scatter(x=x_values, y=y_values, mode='markers')) # ...
 
@@ -124,13 +155,13 @@ def generate_scatter_plot(x, y, values):
 
 
 
-def generate_line_chart(x, y, values):
+def generate_line_chart(x, y, values, rng=random):
     if values:  # Use values if available, otherwise default to a range
         x_values = values
     else:
         x_values = list(range(10))
 
-    y_values = [random.randint(10, 30) for _ in range(len(x_values))]  # Example y-values
+    y_values = [rng.randint(10, 30) for _ in range(len(x_values))]  # Example y-values
 
     fig = go.Figure(data=go.Scatter(x=x_values, y=y_values, mode='lines+markers'))
     fig.update_layout(  # ... rest of layout
@@ -142,47 +173,283 @@ def generate_line_chart(x, y, values):
 
 
 
-# Initialize figure_map
-dynamic_figure_map = {}
-
-# Populate figure_map
-for row in rows:
-    dynamic_figure_map[row] = {}
-    for col in cols:
-        # Filter data
-        filtered_data = [
-            item for item in data
-            if item['תחום'] == row and item['מאפיין'] + ' ' + item['התנהגות / עמדות / ידע'] == col
-        ]
-
-        if filtered_data:
-            item = filtered_data[0]
-            metadata = {
-                'measurement_method': item.get('אופן חישוב המדד', "N/A"),
-                'survey_item': item.get('סעיף / היגד על', ""),
-                'source': item.get('מקור', "U"),
-                'link': item.get('קישור', ""),
-                'notes': item.get('הערות', "")
-            }
+def style_modal_figure(figure):
+    """Apply the modal look (template, fonts, legend, Safe palette) to a cell figure."""
+    figure.update_layout(
+        template="simple_white",
+        margin=dict(l=60, r=60, t=50, b=60),
+        height=450,
+        font=dict(size=22, family="Arial, sans-serif"),
+        hovermode="x unified",
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="white",
+        title_font=dict(size=26, family="Arial, sans-serif"),
+        xaxis=dict(
+            title_font=dict(size=22),
+            tickfont=dict(size=20)
+        ),
+        yaxis=dict(
+            title_font=dict(size=22),
+            tickfont=dict(size=20)
+        ),
+        legend=dict(
+            font=dict(size=20),
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+
+    # Apply Safe color palette based on chart type
+    if figure.data:
+        trace = figure.data[0]
+
+        # Try to get Safe colors from plotly, fall back to our defined colors
+        try:
+            safe_colors = plotly.colors.qualitative.Safe
+        except AttributeError:
+            safe_colors = SAFE_COLORS
+
+        if hasattr(trace, 'marker') and hasattr(trace.marker, 'color'):
+            # For bar charts and scatter plots
+            trace.marker.color = safe_colors[0]
+        elif hasattr(trace, 'marker') and hasattr(trace.marker, 'colors'):
+            # For pie charts
+            trace.marker.colors = safe_colors[:len(trace.labels) if hasattr(trace, 'labels') else 4]
+    return figure
+
+
+def build_cell_figure(row, col, items):
+    """Build the chart and metadata for a single (תחום, column) cell.
+
+    The chart is drawn from the first catalog item of the cell; the survey
+    items of any further items are listed under 'related_items'.
+    """
+    item = items[0]
+    metadata = {
+        'measurement_method': item.get('אופן חישוב המדד', "N/A"),
+        'survey_item': item.get('סעיף / היגד על', ""),
+        'source': item.get('מקור', "U"),
+        'link': item.get('קישור', ""),
+        'notes': item.get('הערות', ""),
+        'related_items': [other.get('סעיף / היגד על', "") for other in items[1:]]
+    }
+
+    # Extract values from 'תשובות אפשריות' if available, otherwise from 'פריט/היגד מקורי'
+    values = extract_bracketed_values(item.get("תשובות אפשריות", None)) or extract_bracketed_values(item.get("פריט/היגד מקורי", None))
+
+    # Mock values depend only on the seed and the cell, so a rebuilt cell looks the same
+    rng = random.Random(f"{MOCK_SEED}:{row}:{col}")
+
+    graph_type = item.get("גרף", "")  # Get the graph type from the data
+    if graph_type == "bar":
+        figure = generate_dynamic_figure(row, col, values, rng)
+    elif graph_type == "scatter":
+        figure = generate_scatter_plot(row, col, values, rng)
+    elif graph_type == "line":
+        figure = generate_line_chart(row, col, values, rng)
+    elif graph_type == "pie":
+        figure = generate_pie_chart(row, col, values, rng)
+    else:  # Default to bar chart if "גרף" is missing or invalid
+        figure = generate_dynamic_figure(row, col, values, rng)
+
+    return {
+        'figure': figure,
+        'metadata': metadata
+    }
+
+
+# A built cell: styled figure as JSON, read-only metadata and a content hash for HTTP caching
+CellEntry = namedtuple('CellEntry', ['figure_json', 'metadata', 'etag'])
+
+
+def build_cell_entry(row, col, items):
+    """Build a cell once and freeze it: the styled figure as JSON, read-only metadata."""
+    figure_data = build_cell_figure(row, col, items)
+    figure_json = pio.to_json(style_modal_figure(figure_data['figure']), validate=False)
+    metadata = dict(figure_data['metadata'], related_items=tuple(figure_data['metadata']['related_items']))
+    digest = hashlib.sha1(figure_json.encode('utf-8'))
+    digest.update(json.dumps(metadata, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return CellEntry(figure_json, MappingProxyType(metadata), digest.hexdigest())
 
-            # Extract values from 'תשובות אפשריות' if available, otherwise from 'פריט/היגד מקורי'
-            values = extract_bracketed_values(item.get("תשובות אפשריות", None)) or extract_bracketed_values(item.get("פריט/היגד מקורי", None))
-
-            graph_type = item.get("גרף", "")  # Get the graph type from the data
-            if graph_type == "bar":
-                figure = generate_dynamic_figure(row, col, values)
-            elif graph_type == "scatter":
-                figure = generate_scatter_plot(row, col, values)
-            elif graph_type == "line":
-                figure = generate_line_chart(row, col, values)
-            elif graph_type == "pie":
-                figure = generate_pie_chart(row, col, values)
-            else:  # Default to bar chart if "גרף" is missing or invalid
-                figure = generate_dynamic_figure(row, col, values)
-
-            dynamic_figure_map[row][col] = {
-                'figure': figure,
-                'metadata': metadata
+
+class FigureRow(Mapping):
+    """Read-only view of one row of a LazyFigureMap."""
+
+    def __init__(self, figure_map, row):
+        self._figure_map = figure_map
+        self._row = row
+
+    def __getitem__(self, col):
+        return self._figure_map.cell(self._row, col)
+
+    def __iter__(self):
+        return iter(self._figure_map.cells[self._row])
+
+    def __len__(self):
+        return len(self._figure_map.cells[self._row])
+
+    def __contains__(self, col):
+        cells = self._figure_map.cells[self._row]
+        return col in cells or normalize(col) in cells
+
+
+class CacheCounts:
+    """Hits and misses summed over every figure map reporting to it, across catalog generations."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def add(self, hits=0, misses=0):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+# Cumulative cell figure cache counts of all catalogs; a reload's new figure map starts at zero
+cell_figure_counts = CacheCounts()
+
+
+class LazyFigureMap(Mapping):
+    """Mapping of row -> column -> {'figure', 'metadata'} that builds figures on demand.
+
+    Only the catalog items of each cell are kept up front; the Plotly figure is
+    built and styled the first time a cell is requested and kept in a
+    size-bounded LRU as serialized JSON. Every lookup hands out a fresh figure
+    dict, so callers may modify it without affecting other requests.
+    """
+
+    def __init__(self, cells, maxsize=FIGURE_CACHE_SIZE, counts=None):
+        self.cells = cells
+        self.maxsize = maxsize
+        self.counts = counts
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, row):
+        if row not in self.cells:
+            row = normalize(row)
+            if row not in self.cells:
+                raise KeyError(row)
+        return FigureRow(self, row)
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, row):
+        return row in self.cells or normalize(row) in self.cells
+
+    def cell(self, row, col):
+        entry = self.cell_entry(row, col)
+        return {
+            'figure': json.loads(entry.figure_json),
+            'metadata': entry.metadata
+        }
+
+    def cell_entry(self, row, col):
+        """Return the cached CellEntry of a cell, building it if needed."""
+        # Keys from the label tables are already normalized; only normalize on a miss
+        row_cells = self.cells.get(row)
+        if row_cells is None or col not in row_cells:
+            row, col = normalize(row), normalize(col)
+        key = (row, col)
+        with self._lock:
+            entry = self._figures.get(key)
+            if entry is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                if self.counts is not None:
+                    self.counts.add(hits=1)
+                return entry
+
+        items = self.cells[row][col]  # KeyError for unknown cells, like a dict
+        entry = build_cell_entry(row, col, items)
+
+        if self.counts is not None:
+            self.counts.add(misses=1)
+        with self._lock:
+            self.misses += 1
+            previous = self._figures.pop(key, None)
+            if previous is not None:
+                self.nbytes -= len(previous.figure_json)
+            self._figures[key] = entry
+            self.nbytes += len(entry.figure_json)
+            while len(self._figures) > self.maxsize:
+                _, evicted = self._figures.popitem(last=False)
+                self.nbytes -= len(evicted.figure_json)
+        notify_growth()
+        return entry
+
+    def cache_clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cells': sum(len(cols) for cols in self.cells.values()),
+                'cached': len(self._figures),
+                'bytes': self.nbytes,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
             }
 
-figure_map = dynamic_figure_map
\ No newline at end of file
+
+# One immutable generation of the catalog. A reload builds a new Catalog and
+# swaps it in whole; callbacks holding the previous one finish with it.
+Catalog = namedtuple('Catalog', ['version', 'data', 'cell_items', 'rows', 'cols', 'figure_map'])
+
+
+def build_catalog(data_dir=DATA_DIR):
+    """Load and index the catalog of data_dir; figures are built lazily by LazyFigureMap."""
+    # Stat before reading: if the file changes meanwhile, the next poll sees a newer version
+    version = file_version(os.path.join(data_dir, CATALOG_FILE))
+
+    # Load the measurement data into slotted records sharing every repeated string
+    # (combined_metric is derived on access); mock numeric values are seeded so every
+    # worker sees the same ones
+    rng = np.random.default_rng(MOCK_SEED)
+    strings = {}
+    items = load_catalog(data_dir, lambda record: CatalogItem(randomize_numeric([record], rng)[0], strings))
+
+    # Index the catalog items of every cell
+    cells = build_catalog_index(items)
+
+    # Define the fixed rows and columns
+    row_keys = sorted(cells)
+    col_keys = sorted({col for row_items in cells.values() for col in row_items})
+    return Catalog(version, items, cells, row_keys, col_keys, LazyFigureMap(cells, counts=cell_figure_counts))
+
+
+def current_catalog():
+    """The catalog generation currently served."""
+    return _catalog
+
+
+def swap_catalog(catalog):
+    """Publish a new catalog generation (a single reference assignment, atomic for readers)."""
+    global _catalog, data, cell_items, rows, cols, figure_map
+    _catalog = catalog
+    # Module-level aliases kept for scripts; callbacks should use current_catalog()
+    _, data, cell_items, rows, cols, figure_map = catalog
+
+
+swap_catalog(build_catalog())
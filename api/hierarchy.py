@@ -0,0 +1,102 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+from .data_store import DerivedTables
+from .labels import convert_AI_label, label_table
+
+# Row-aggregation functions of the grouped view: value -> (label, reducer)
+AGGREGATES = {
+    'mean': ('ממוצע', None),
+    'min': ('מינימום', np.minimum),
+    'max': ('מקסימום', np.maximum),
+}
+
+# Parent/child structure of the y-axis topics of one data version.
+#   parents         - parent categories, in order of first appearance
+#   children        - per parent, int array of the rows of its topics
+#   order, starts   - row permutation grouping rows by parent, and the start of each group in it
+#   counts          - number of child rows per parent
+#   collapsed_labels / expanded_labels - y labels of a parent's aggregated row
+#   label_parent    - aggregated-row label (either state) -> parent
+#   row_parent      - per row, the position of its parent in parents
+RowGroups = namedtuple('RowGroups', [
+    'version', 'parents', 'children', 'order', 'starts', 'counts',
+    'collapsed_labels', 'expanded_labels', 'label_parent', 'row_parent',
+])
+
+
+def parent_category(topic):
+    """Parent of a topic, split the same way as the y-axis labels ("ניהול מידע התנהגות" -> "ניהול מידע")."""
+    return topic.rsplit(" ", 1)[0] if " " in topic else topic
+
+
+def build_row_groups(snapshot):
+    parents = list(dict.fromkeys(parent_category(topic) for topic in snapshot.index))
+    position = {parent: i for i, parent in enumerate(parents)}
+    inverse = np.array([position[parent_category(topic)] for topic in snapshot.index], dtype=np.intp)
+    order = np.argsort(inverse, kind='stable')
+    counts = np.bincount(inverse, minlength=len(parents))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    children = tuple(order[start:start + count] for start, count in zip(starts, counts))
+
+    display = [f"<b>{parent}</b>" for parent in parents]
+    convert_AI_label(display)
+    collapsed_labels = tuple(f"{label} ▸" for label in display)
+    expanded_labels = tuple(f"{label} ▾" for label in display)
+    label_parent = dict(zip(collapsed_labels, parents))
+    label_parent.update(zip(expanded_labels, parents))
+    return RowGroups(snapshot.version, tuple(parents), children, order, starts, counts,
+                     collapsed_labels, expanded_labels, MappingProxyType(label_parent), inverse)
+
+
+_row_groups = DerivedTables(build_row_groups)
+
+
+def row_groups(snapshot):
+    """Return the RowGroups of a snapshot, built once per data version."""
+    return _row_groups.get(snapshot)
+
+
+def aggregate_rows(matrix, groups, how='mean'):
+    """Aggregate the rows of matrix by parent in one vectorized pass: (parents x columns)."""
+    grouped = matrix[groups.order]
+    reducer = AGGREGATES[how][1]
+    if reducer is None:
+        return np.add.reduceat(grouped, groups.starts, axis=0) / groups.counts[:, None]
+    return reducer.reduceat(grouped, groups.starts, axis=0)
+
+
+def parent_row_position(groups, parent, expanded):
+    """Row of a parent's aggregated row in the grouped view, given the expanded parents."""
+    position = 0
+    for other, count in zip(groups.parents, groups.counts):
+        if other == parent:
+            return position
+        position += 1 + (count if other in expanded else 0)
+    raise KeyError(parent)
+
+
+def grouped_view(snapshot, matrix, how='mean', expanded=()):
+    """Rows of the grouped view: one aggregated row per parent, followed by its topics when expanded.
+
+    Returns (rows, y_labels); rows holds aggregated rows and the expanded
+    children's original rows, in display order.
+    """
+    groups = row_groups(snapshot)
+    leaf_labels = label_table(snapshot).y_labels
+    aggregated = aggregate_rows(matrix, groups, how)
+    expanded = set(expanded)
+
+    index, y_labels = [], []
+    n_parents = len(groups.parents)
+    for p, parent in enumerate(groups.parents):
+        index.append(p)
+        if parent in expanded:
+            y_labels.append(groups.expanded_labels[p])
+            index.extend((n_parents + groups.children[p]).tolist())
+            y_labels.extend(leaf_labels[row] for row in groups.children[p])
+        else:
+            y_labels.append(groups.collapsed_labels[p])
+    return np.vstack([aggregated, matrix])[index], y_labels
@@ -3,70 +3,63 @@ from dash import dcc, html, Dash
 from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
-import plotly.colors
-from flask import Flask
+import plotly.io as pio
+from flask import Flask, jsonify, request, stream_with_context
+import hashlib
 import json
-import os
-import re
 import logging
+import os
+from urllib.parse import parse_qs
 
-# Import your figures_map if needed
-from .figures_map import figure_map  # Assuming this file contains your figure data
-
-# Define a safe color palette as fallback
-SAFE_COLORS = [
-    '#88CCEE', '#44AA99', '#117733', '#332288', '#DDCC77',
-    '#999933', '#CC6677', '#882255', '#AA4499', '#DDDDDD'
-]
+# Catalog figures; the current generation is looked up per call because data can be reloaded
+from .figures_map import cell_figure_counts, current_catalog
+from .data_store import store, select_columns, mask_range
+from .figure_cache import heatmap_cache
+from .labels import label_table, resolve_cell
+from . import typed_array
+from .hierarchy import AGGREGATES, grouped_view, parent_row_position, row_groups
+from .summary import marginal_data, matrix_summary, summarize
+from .search import search_index
+from . import metrics
+from .metrics import instrumented
+from .log_config import configure_logging, install_request_ids
+from .reload import watcher
+from .export import DEFAULT_FORMAT, EXPORT_FORMATS, stream_export
+from .datasets import datasets
 
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 print("Starting Flask server...")
 
-# Load data from JSON
-def load_data(file_path):
+# Browser/CDN cache lifetime of the JSON cell-detail endpoint, in seconds
+CELL_CACHE_MAX_AGE = int(os.environ.get('CELL_CACHE_MAX_AGE', 3600))
+# Part of the /api/modal ETag: the modal markup changes with this module, so a deploy never revalidates a stale one
+with open(__file__, 'rb') as _source:
+    MODAL_RENDER_VERSION = hashlib.blake2b(_source.read(), digest_size=8).hexdigest()
+
+# Opt-in mode where the matrix is shipped to the browser once and filtered client-side
+HEATMAP_CLIENTSIDE = os.environ.get('HEATMAP_CLIENTSIDE', '0') == '1'
+# Heatmap z encoding: 'binary' (base64 typed array) or 'json' (nested lists, for custom pre-2.28 Plotly.js bundles)
+HEATMAP_Z_ENCODING = os.environ.get('HEATMAP_Z_ENCODING', 'binary')
+
+COLORSCALE_OPTIONS = [
+    {'label': 'חם', 'value': 'Reds'},
+    {"label": "רמזור", "value": "R"},
+    {'label': 'קר', 'value': 'Cividis'},
+    {'label': 'פלזמה', 'value': 'Plasma'},
+    {'label': 'כחול', 'value': 'Blues'},
+    {'label': 'ירוק', 'value': 'Greens'},
+]
+
+# Load data from JSON (parsed once per file version by the dataset's data store)
+def load_data(file_path, dataset_name=None):
     try:
-        full_path = os.path.join('public', file_path)
-        with open(full_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        df = {key: [row[key] for row in data] for key in data[0]}
-        y_axis_categories = df.pop('נושא', None)
-        return df, y_axis_categories
+        snapshot = datasets.get(dataset_name).table(file_path)
+        return snapshot.columns, snapshot.index
     except Exception as e:
         logging.error(f"Error loading data: {e}")
+        metrics.handled_exception()
         return {}, []
 
-# --- Text Handling ---
-def update_y_axis_categories_with_extra_column(y_labels):
-    """Update y-axis labels."""
-    updated_labels = []
-    for label in y_labels:
-        if " " in label:
-            parent_category, subcategory = label.rsplit(" ", 1)
-            updated_label = f"<b>{parent_category}</b> | {subcategory}"
-        else:
-            updated_label = label
-        updated_labels.append(updated_label)
-    return updated_labels
-
-def clean_html_string(html_string):
-    if html_string is None:
-        return ""
-    # קודם כל להחליף תגיות <br> ברווח, כדי שלא ייעלמו
-    text = re.sub(r'<br\s*/?>', ' ', html_string)
-    # אחר-כך להסיר את כל שאר התגיות
-    text = re.sub(r'<.*?>', '', text)
-    # להמיר מפריד אנכי לרווח
-    text = re.sub(r'\s*\|\s*', ' ', text)
-    # לצמצם רווחים מיותרים
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def convert_AI_label(y_axis_labels):
-    """Replace "AI" with "בינה מלאכותית"."""
-    for i in range(len(y_axis_labels)):
-        if "AI" in y_axis_labels[i]:
-            y_axis_labels[i] = y_axis_labels[i].replace("AI", "<b>בינה מלאכותית</b>")
-
 # --- App Setup ---
 app = Flask(__name__, static_folder='public')
 dashApp = Dash(__name__, server=app, external_stylesheets=[
@@ -74,6 +67,38 @@ dashApp = Dash(__name__, server=app, external_stylesheets=[
     "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css"
 ])
 
+# Per-request correlation ids on every log record
+install_request_ids(app)
+
+# Callback latency/payload metrics and cache hit ratios on /metrics
+metrics.install(app, dashApp)
+# Data store and heatmap figure counts summed over all datasets, unloaded ones included
+metrics.register_cache('data_store', lambda: datasets.cache_stats('data_store'))
+metrics.register_cache('heatmap_figures', lambda: datasets.cache_stats('heatmap_figures'))
+metrics.register_cache('cell_figures', cell_figure_counts.stats)
+metrics.register_gauge('dashboard_datasets_bytes', "Estimated bytes of the loaded datasets at the last budget check.",
+                       lambda: datasets.nbytes)
+metrics.register_gauge('dashboard_datasets_budget_bytes', "Memory budget of the loaded datasets (DATASET_MEMORY_BUDGET).",
+                       lambda: datasets.budget)
+metrics.register_gauge('dashboard_datasets_loaded', "Datasets currently loaded.", lambda: len(datasets.stats()['loaded']))
+metrics.register_counter('dashboard_dataset_evictions_total', "Datasets unloaded to stay within the memory budget.",
+                         lambda: datasets.evictions)
+metrics.register_counter('dashboard_data_reloads_total', "Successful reloads of changed data files.",
+                         lambda: watcher.stats()['reloads'])
+metrics.register_counter('dashboard_data_reload_failures_total', "Failed data reloads (retried on the next poll).",
+                         lambda: watcher.stats()['failures'])
+
+# Reload changed data files in the background and rebuild what depends on them before serving it
+@watcher.on_reload
+def warm_derived_tables(changed):
+    snapshot = store.table('example.json')
+    label_table(snapshot)
+    row_groups(snapshot)
+    matrix_summary(snapshot)
+    search_index(current_catalog())
+
+watcher.start()
+
 navbar = html.Div(
     [
         html.Nav(  # Use an HTML nav element for semantic correctness
@@ -135,6 +160,18 @@ dashApp.layout = dbc.Container(fluid=True, style={'direction': 'rtl', 'backgroun
     dbc.Row([
         # --- Sidebar ---
         dbc.Col([
+            dbc.Card([
+                dbc.CardHeader(html.H5("מאגר נתונים", className="card-title")),
+                dbc.CardBody([
+                    dcc.Dropdown(
+                        id='dataset',
+                        options=[{'label': name, 'value': name} for name in datasets.names()],
+                        value=datasets.default.name,
+                        clearable=False
+                    ),
+                ]),
+            # Shown only when there is more than one dataset to pick from
+            ], id='dataset-card', style={'margin-bottom': '20px', 'display': 'none'}),
             dbc.Card([
                 dbc.CardHeader(html.H5("בחרו תחומי חיים", className="card-title")),
                 dbc.CardBody([
@@ -146,8 +183,23 @@ dashApp.layout = dbc.Container(fluid=True, style={'direction': 'rtl', 'backgroun
                     ),
                     dbc.Button("בחר הכל / בטל הכל", id='select-all-button', n_clicks=0, color='primary', style={'width': '100%', 'margin-top': '10px'}),
                     dbc.Button("בדיקת מודל", id='test-modal-button', n_clicks=0, color='secondary', style={'width': '100%', 'margin-top': '10px'}),
+                    dbc.Button("הורדת כל הגרפים (ZIP)", id='export-button', href='/api/export.zip', external_link=True, color='secondary', style={'width': '100%', 'margin-top': '10px'}),
                 ]),
             ], style={'margin-bottom': '20px'}),
+            dbc.Card([
+                dbc.CardHeader(html.H5("חיפוש בקטלוג", className="card-title")),
+                dbc.CardBody([
+                    dcc.Input(
+                        id='catalog-search',
+                        type='search',
+                        placeholder='מילה או צירוף מתוך הפריטים...',
+                        debounce=False,
+                        style={'width': '100%'}
+                    ),
+                    html.Div(id='catalog-search-status', style={'fontSize': '14px', 'margin-top': '8px'}),
+                ]),
+            # Highlights are drawn on the server-rendered figure only
+            ], style={'margin-bottom': '20px', 'display': 'none' if HEATMAP_CLIENTSIDE else 'block'}),
             dbc.Card([
                 dbc.CardHeader(html.H5("פילטר ערכים", className="card-title")),
                 dbc.CardBody([
@@ -162,19 +214,34 @@ dashApp.layout = dbc.Container(fluid=True, style={'direction': 'rtl', 'backgroun
                     ),
                 ]),
             ], style={'margin-bottom': '20px', 'display': "none"}),
+            dbc.Card([
+                dbc.CardHeader(html.H5("תצוגת שורות", className="card-title")),
+                dbc.CardBody([
+                    dcc.RadioItems(
+                        id='row-view',
+                        options=[
+                            {'label': 'מלאה', 'value': 'leaf'},
+                            {'label': 'מקובצת לפי מאפיין', 'value': 'grouped'},
+                        ],
+                        value='leaf',
+                        labelStyle={'display': 'block', 'margin-left': '10px'}
+                    ),
+                    dcc.Dropdown(
+                        id='row-aggregate',
+                        options=[{'label': label, 'value': value} for value, (label, _) in AGGREGATES.items()],
+                        value='mean',
+                        clearable=False,
+                        style={'margin-top': '10px'}
+                    ),
+                ]),
+            # The grouped view is rendered server-side only
+            ], style={'margin-bottom': '20px', 'display': 'none' if HEATMAP_CLIENTSIDE else 'block'}),
             dbc.Card([
                 dbc.CardHeader(html.H5("בחרו צבעים", className="card-title")),
                 dbc.CardBody([
                     dcc.Dropdown(
                         id='colorscale-dropdown',
-                        options=[
-                            {'label': 'חם', 'value': 'Reds'},
-                            {"label": "רמזור", "value": "R"},
-                            {'label': 'קר', 'value': 'Cividis'},
-                            {'label': 'פלזמה', 'value': 'Plasma'},
-                            {'label': 'כחול', 'value': 'Blues'},
-                            {'label': 'ירוק', 'value': 'Greens'},
-                        ],
+                        options=COLORSCALE_OPTIONS,
                         value='Reds',
                         clearable=False
                     ),
@@ -226,10 +293,15 @@ dashApp.layout = dbc.Container(fluid=True, style={'direction': 'rtl', 'backgroun
     ]),
 
     # Hidden components for interactivity
+    dcc.Location(id='url'),
     dcc.Store(id='screen-size-store'),
+    dcc.Store(id='heatmap-data-store'),  # Matrix for the client-side heatmap mode
+    dcc.Store(id='expanded-parents', data={'expanded': [], 'toggled': None}),  # Grouped view drill-down
+    dcc.Store(id='parent-row-click'),  # Clicks on the grouped view's parent rows only
     dcc.Store(id='selected-cell-data'),
     dcc.Store(id='last-click-time', data=0),  # For debouncing
     dcc.Store(id='modal-click-data'),  # Store click data separately
+    dcc.Store(id='modal-prefetch'),  # Output of the hover prefetch (the cache itself lives in the browser)
     # dcc.Store(id='heatmap-size', data={'width': 1400, 'height': 750}),
     dcc.Interval(id='interval-component', interval=1000, n_intervals=0, max_intervals=1),
 
@@ -263,12 +335,6 @@ dashApp.layout = dbc.Container(fluid=True, style={'direction': 'rtl', 'backgroun
     )
 ])
 
-def original_row_key(y_label):
-    txt = clean_html_string(y_label)
-    if "|" in y_label:
-        txt = txt.split("|")[0]
-    return txt.strip()
-
 dashApp.clientside_callback(
     """
     function(n_intervals) {
@@ -341,135 +407,359 @@ dashApp.clientside_callback(
     prevent_initial_call=True
 )
 
-def change_x_labels(x_labels):
-    x_axis_labels_modified = []
-    for label in x_labels:
-        if " " in label:  # Check for multiple words
-            modified_label = label.replace(" ", "<br>") # Insert <br> tag
-            x_axis_labels_modified.append(modified_label)
-        else:
-            x_axis_labels_modified.append(label)
-    return ['<b>' + label + '</b>' for label in x_axis_labels_modified]
+# Define traffic-light color scheme matching the provided image
+TRAFFIC_LIGHT_COLORS = [
+    [0.0, "rgba(34,139,34,0.9)"],     # Forest Green (lowest values)
+    [0.1, "rgba(50,205,50,0.9)"],     # Lime Green
+    [0.2, "rgba(124,252,0,0.9)"],     # Lawn Green
+    [0.3, "rgba(173,255,47,0.9)"],    # Green Yellow
+    [0.4, "rgba(255,255,0,0.9)"],     # Yellow
+    [0.5, "rgba(255,215,0,0.9)"],     # Gold
+    [0.6, "rgba(255,165,0,0.9)"],     # Orange
+    [0.7, "rgba(255,140,0,0.8)"],     # Dark Orange
+    [0.8, "rgba(255,69,0,0.8)"],      # Orange Red
+    [0.9, "rgba(255,0,0,0.8)"],       # Red
+    [1.0, "rgba(178,34,34,0.8)"],     # Fire Brick (highest values)
+]
 
-@dashApp.callback(
-    Output('heatmap', 'figure'),
-    [
-        Input('column-checklist', 'value'),
-        Input('value-range-slider', 'value'),
-        Input('colorscale-dropdown', 'value'),
-        Input('screen-size-store', 'data'),
-    ],
-    prevent_initial_call=False
-)
-def update_heatmap(selected_columns, value_range, selected_colorscale, screen_size_data):
+# Screen sizes are rounded to this many pixels so nearby sizes share a cached figure
+SIZE_BUCKET = 50
+
+# Share of the plot area taken by the heatmap; the rest holds the row/column summary bars
+HEATMAP_DOMAIN = 0.88
+SUMMARY_COLOR = '#6c757d'
+
+# Trace of the search highlights, drawn over the heatmap after the two summary bar traces
+SEARCH_TRACE = 3
+SEARCH_COLOR = '#0d6efd'
+
+# Heatmap inputs answered with a partial figure update instead of a rebuild
+PATCHED_INPUTS = ('colorscale-dropdown', 'value-range-slider', 'screen-size-store')
+
+def resolve_colorscale(selected_colorscale):
+    if selected_colorscale == "R":
+        return TRAFFIC_LIGHT_COLORS
+    # Use the traffic-light scheme as default when not using built-in schemes
+    return TRAFFIC_LIGHT_COLORS
+
+def bucket_screen_size(screen_size_data):
+    """Round the reported screen size to SIZE_BUCKET pixels (None when unknown)."""
+    if not screen_size_data:
+        return None
+    width = screen_size_data.get('width', 1100)
+    height = screen_size_data.get('height', 750)
+    return (int(round(width / SIZE_BUCKET)) * SIZE_BUCKET,
+            int(round(height / SIZE_BUCKET)) * SIZE_BUCKET)
+
+def canonical_columns(snapshot, selected_columns):
+    """Selected columns in data order, so equivalent selections share a cache entry.
+
+    Columns the snapshot lacks (left selected from another dataset) are dropped.
+    """
+    if not selected_columns:
+        return ()
+    columns = set(selected_columns).intersection(snapshot.column_index)
+    return tuple(sorted(columns, key=snapshot.column_index.__getitem__))
+
+def triggered_id():
+    """Id of the one input that fired the current callback.
+
+    None on the initial call, outside a callback, and when several inputs
+    fired together (Dash merges them into one request, e.g. on page load).
+    """
     try:
-        # Load data
-        df, y_axis_categories = load_data('example.json')
-
-        # Filter data
-        df_filtered = {key: df[key] for key in selected_columns} if selected_columns else df
-        z_values = list(zip(*df_filtered.values()))
-        min_val, max_val = value_range
-        z_values_filtered = [
-            [value if min_val <= value <= max_val else None for value in row]
-            for row in z_values
-        ]
+        triggered = dash.ctx.triggered_prop_ids
+    except dash.exceptions.MissingCallbackContextException:
+        return None
+    return next(iter(triggered.values())) if len(triggered) == 1 else None
 
-        # Format labels
-        y_axis_labels = update_y_axis_categories_with_extra_column(y_axis_categories)
-        convert_AI_label(y_axis_labels)
+def nan_to_none(rows):
+    return [[None if value != value else value for value in row] for row in rows.tolist()]
 
-        # Adjust heatmap size based on screen dimensions
-        if screen_size_data:
-            width = screen_size_data.get('width', 1100)
-            height = screen_size_data.get('height', 750)
-            adjusted_width = width * 0.8  # Adjust as needed
-            adjusted_height = height * 0.85
-        else:
-            adjusted_width = 1100
-            adjusted_height = 750
-
-        # Define traffic-light color scheme matching the provided image
-        traffic_light_colors = [
-            [0.0, "rgba(34,139,34,0.9)"],     # Forest Green (lowest values)
-            [0.1, "rgba(50,205,50,0.9)"],     # Lime Green
-            [0.2, "rgba(124,252,0,0.9)"],     # Lawn Green
-            [0.3, "rgba(173,255,47,0.9)"],    # Green Yellow
-            [0.4, "rgba(255,255,0,0.9)"],     # Yellow
-            [0.5, "rgba(255,215,0,0.9)"],     # Gold
-            [0.6, "rgba(255,165,0,0.9)"],     # Orange
-            [0.7, "rgba(255,140,0,0.8)"],     # Dark Orange
-            [0.8, "rgba(255,69,0,0.8)"],      # Orange Red
-            [0.9, "rgba(255,0,0,0.8)"],       # Red
-            [1.0, "rgba(178,34,34,0.8)"],     # Fire Brick (highest values)
-        ]
+def heatmap_view(snapshot, selected_columns, row_view='leaf', row_aggregate='mean', expanded=()):
+    """Return (column_names, rows, y_labels): the unmasked values shown for the selection and row view."""
+    # Column subset via a fancy index; formatted labels are computed once per data version
+    column_names, matrix = select_columns(snapshot, selected_columns)
 
-        if selected_colorscale == "R":
-            selected_colorscale = traffic_light_colors
-        else:
-            # Use the traffic-light scheme as default when not using built-in schemes
-            selected_colorscale = traffic_light_colors
-
-        # Create figure with enhanced click detection
-        fig = go.Figure(
-            data=go.Heatmap(
-                z=z_values_filtered,
-                x=change_x_labels(list(df_filtered.keys())),
-                y=y_axis_labels,
-                colorscale=selected_colorscale,
-                hoverongaps=False,
-                showscale=False,
-                ygap=1.5,
-                xgap=1.5,
-                colorbar=dict(title="ערך", titleside="right"),
-                hovertemplate='<b>לחץ כאן עבור מידע נוסף</b><br>%{x}<br>%{y}<br>ערך: %{z}<extra></extra>',
-                # Enhanced hover and click behavior
-                hoverinfo='text',
-                hoverlabel=dict(
-                    bgcolor="white",
-                    bordercolor="black",
-                    font_size=16,
-                    font_family="Arial",
-                    namelength=-1
-                )
-            ),
-        )
+    # Grouped view: one aggregated row per parent category, plus the topics of expanded parents
+    if row_view == 'grouped':
+        rows, y_axis_labels = grouped_view(snapshot, matrix, row_aggregate, expanded)
+    else:
+        rows, y_axis_labels = matrix, label_table(snapshot).y_labels
+    return column_names, rows, y_axis_labels
 
-        # Update layout with enhanced click detection
-        fig.update_layout(
-            font=dict(size=14, family="Arial, sans-serif"),
-            xaxis=dict(
-                tickangle=0,
-                tickfont=dict(size=16, family="Arial, sans-serif"),
-                title_text="",
-                side="bottom",
-                automargin=True,
-                constrain="domain"
-            ),
-            yaxis=dict(
-                tickfont=dict(size=18, family="Arial, sans-serif"),
-                automargin=True,
-                side="left",
-            ),
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="white",
-            height=adjusted_height,
-            width=adjusted_width,
-            margin=dict(l=10, r=10, t=10, b=10),
+def marginal_stats(snapshot, column_names, rows, value_range, row_view='leaf'):
+    """(row mean, row customdata, column mean, column customdata) of the summary bars.
+
+    Column summaries always cover every topic and come from the per-version
+    cache; so do row summaries of the full leaf view. Other row views are
+    summarized as displayed.
+    """
+    summary = matrix_summary(snapshot)
+    positions = [snapshot.column_index[column] for column in column_names]
+    column_mean, column_data = marginal_data(summary.columns, value_range, positions)
+    if row_view == 'leaf' and len(positions) == len(snapshot.columns):
+        row_summary = summary.rows
+    else:
+        row_summary = summarize(rows)
+    row_mean, row_data = marginal_data(row_summary, value_range)
+    return row_mean, row_data, column_mean, column_data
+
+def marginal_traces(x_labels, y_labels, row_mean, row_data, column_mean, column_data):
+    """Bar traces of the row (right) and column (top) means, with the other statistics on hover."""
+    details = ('חציון: %{customdata[0]:.2f}<br>אחוזונים 25-75: %{customdata[1]:.2f}-%{customdata[2]:.2f}'
+               '<br>תאים בטווח: %{customdata[3]} מתוך %{customdata[4]}<extra></extra>')
+    style = dict(marker_color=SUMMARY_COLOR, showlegend=False, hoverlabel=dict(bgcolor="white", font_size=14))
+    return [
+        go.Bar(x=row_mean, y=y_labels, orientation='h', customdata=row_data, xaxis='x2', yaxis='y',
+               hovertemplate='<b>%{y}</b><br>ממוצע: %{x:.2f}<br>' + details, **style),
+        go.Bar(x=x_labels, y=column_mean, customdata=column_data, xaxis='x', yaxis='y2',
+               hovertemplate='<b>%{x}</b><br>ממוצע: %{y:.2f}<br>' + details, **style),
+    ]
+
+def search_highlights(snapshot, catalog, query, selected_columns, row_view='leaf', expanded=()):
+    """(x, y, matches, hidden): axis labels of the displayed cells whose catalog items match query.
+
+    matches counts the matching catalog cells, hidden those of them in
+    unselected columns or missing from the heatmap. In the grouped
+    view a topic of a collapsed parent is highlighted on the parent's row.
+    """
+    cells = search_index(catalog).search(query) if query else []
+    labels = label_table(snapshot)
+    shown = set(selected_columns) if selected_columns else None
+    groups = row_groups(snapshot) if row_view == 'grouped' else None
+    expanded = set(expanded)
+
+    points = {}
+    hidden = 0
+    for domain, metric in cells:
+        column = labels.x_by_key.get(domain)
+        row = labels.row_by_key.get(metric)
+        if column is None or row is None or (shown is not None and column not in shown):
+            hidden += 1
+            continue
+        y_label = labels.y_labels[row]
+        if groups is not None:
+            p = groups.row_parent[row]
+            if groups.parents[p] not in expanded:
+                y_label = groups.collapsed_labels[p]
+        points[labels.x_labels[column], y_label] = None
+    return [x for x, _ in points], [y for _, y in points], len(cells), hidden
+
+def search_trace(x_labels=(), y_labels=()):
+    """Outlined squares over the highlighted cells; not hoverable, so clicks reach the heatmap."""
+    return go.Scatter(x=list(x_labels), y=list(y_labels), mode='markers', hoverinfo='skip', showlegend=False,
+                      marker=dict(symbol='square-open', size=26, color=SEARCH_COLOR, line=dict(width=3)))
+
+def with_highlights(figure, x_labels, y_labels):
+    """Shallow copy of a cached figure with the search highlights filled in."""
+    data = list(figure['data'])
+    data[SEARCH_TRACE] = dict(data[SEARCH_TRACE], x=x_labels, y=y_labels)
+    return dict(figure, data=data)
+
+def heatmap_dimensions(screen_size):
+    """Figure (width, height) for a bucketed screen size."""
+    # Adjust heatmap size based on screen dimensions
+    if screen_size:
+        width, height = screen_size
+        return width * 0.8, height * 0.85  # Adjust as needed
+    return 1100, 750
+
+def build_heatmap_figure(snapshot, selected_columns, value_range, selected_colorscale, screen_size,
+                         row_view='leaf', row_aggregate='mean', expanded=(), marginals=True):
+    column_names, rows, y_axis_labels = heatmap_view(snapshot, selected_columns, row_view, row_aggregate, expanded)
+    z_values_filtered = mask_range(rows, value_range)
+    labels = label_table(snapshot)
+    x_axis_labels = [labels.x_labels[column] for column in column_names]
+    adjusted_width, adjusted_height = heatmap_dimensions(screen_size)
+
+    # Create figure with enhanced click detection
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=z_values_filtered,
+            x=x_axis_labels,
+            y=y_axis_labels,
+            colorscale=resolve_colorscale(selected_colorscale),
+            hoverongaps=False,
+            showscale=False,
+            ygap=1.5,
+            xgap=1.5,
+            colorbar=dict(title="ערך", titleside="right"),
+            hovertemplate='<b>לחץ כאן עבור מידע נוסף</b><br>%{x}<br>%{y}<br>ערך: %{z}<extra></extra>',
+            # Enhanced hover and click behavior
+            hoverinfo='text',
             hoverlabel=dict(
-                bgcolor="white",       # Background color of the hover label
-                bordercolor="black",   # Border color of the hover label
-                font_size=16,       # Font size of the hover label
-                font_family="Arial",  # Font family of the hover label
-            ),
-            # Optimize for clicks
-            dragmode=False
+                bgcolor="white",
+                bordercolor="black",
+                font_size=16,
+                font_family="Arial",
+                namelength=-1
+            )
+        ),
+    )
+
+    # Update layout with enhanced click detection
+    fig.update_layout(
+        font=dict(size=14, family="Arial, sans-serif"),
+        xaxis=dict(
+            tickangle=0,
+            tickfont=dict(size=16, family="Arial, sans-serif"),
+            title_text="",
+            side="bottom",
+            automargin=True,
+            constrain="domain"
+        ),
+        yaxis=dict(
+            tickfont=dict(size=18, family="Arial, sans-serif"),
+            automargin=True,
+            side="left",
+        ),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="white",
+        height=adjusted_height,
+        width=adjusted_width,
+        margin=dict(l=10, r=10, t=10, b=10),
+        hoverlabel=dict(
+            bgcolor="white",       # Background color of the hover label
+            bordercolor="black",   # Border color of the hover label
+            font_size=16,       # Font size of the hover label
+            font_family="Arial",  # Font family of the hover label
+        ),
+        # Optimize for clicks
+        dragmode=False
+    )
+
+    # Row and column summaries as bars beside and above the heatmap (trace 0 stays the heatmap),
+    # then the (empty) search highlights on top
+    if marginals:
+        fig.add_traces(marginal_traces(
+            x_axis_labels, y_axis_labels, *marginal_stats(snapshot, column_names, rows, value_range, row_view)))
+        fig.add_trace(search_trace())
+        summary_axis = dict(showgrid=False, zeroline=False, tickfont=dict(size=11))
+        fig.update_layout(
+            xaxis_domain=[0, HEATMAP_DOMAIN],
+            yaxis_domain=[0, HEATMAP_DOMAIN],
+            xaxis2=dict(domain=[HEATMAP_DOMAIN + 0.02, 1], anchor='y', **summary_axis),
+            yaxis2=dict(domain=[HEATMAP_DOMAIN + 0.02, 1], anchor='x', **summary_axis),
+            bargap=0.15,
         )
 
-        return fig
+    return fig
+
+def encode_z(z):
+    """z as sent to the browser: a typed array, or nested lists when HEATMAP_Z_ENCODING is 'json'."""
+    return typed_array.encode(z) if HEATMAP_Z_ENCODING == 'binary' else nan_to_none(z)
+
+def heatmap_payload(fig):
+    """Figure dict to send to the browser, with z as a typed array unless HEATMAP_Z_ENCODING is 'json'."""
+    figure = fig.to_plotly_json()
+    if HEATMAP_Z_ENCODING == 'binary':
+        figure['data'][0]['z'] = encode_z(figure['data'][0]['z'])
+    return figure
+
+def restyle_patch(trigger, snapshot, columns, value_range, selected_colorscale, screen_size,
+                  row_view, row_aggregate, expanded):
+    """Update only what the triggering input changes on the figure already in the browser."""
+    patch = dash.Patch()
+    if trigger == 'colorscale-dropdown':
+        patch['data'][0]['colorscale'] = resolve_colorscale(selected_colorscale)
+    elif trigger == 'value-range-slider':
+        column_names, rows, _ = heatmap_view(snapshot, columns, row_view, row_aggregate, expanded)
+        patch['data'][0]['z'] = encode_z(mask_range(rows, value_range))
+        # Only the in-range counts of the summary bars depend on the range
+        _, row_data, _, column_data = marginal_stats(snapshot, column_names, rows, value_range, row_view)
+        patch['data'][1]['customdata'] = row_data
+        patch['data'][2]['customdata'] = column_data
+    else:
+        width, height = heatmap_dimensions(screen_size)
+        patch['layout']['width'] = width
+        patch['layout']['height'] = height
+    return patch
+
+def expansion_patch(snapshot, columns, value_range, row_aggregate, expanded, toggled):
+    """Insert (or remove) only the topic rows of the toggled parent in the grouped view."""
+    groups = row_groups(snapshot)
+    p = groups.parents.index(toggled)
+    position = parent_row_position(groups, toggled, expanded)
+    children = groups.children[p]
+    _, matrix = select_columns(snapshot, columns)
+    # A typed array cannot be spliced: resend the (compact) z and patch only the labels
+    splice_z = HEATMAP_Z_ENCODING != 'binary'
+
+    column_names, rows, y_axis_labels = heatmap_view(snapshot, columns, 'grouped', row_aggregate, expanded)
+
+    patch = dash.Patch()
+    trace = patch['data'][0]
+    if not splice_z:
+        trace['z'] = encode_z(mask_range(rows, value_range))
+    if toggled in expanded:
+        leaf_labels = label_table(snapshot).y_labels
+        trace['y'][position] = groups.expanded_labels[p]
+        for k, (row, values) in enumerate(zip(children, nan_to_none(mask_range(matrix[children], value_range)))):
+            trace['y'].insert(position + 1 + k, leaf_labels[row])
+            if splice_z:
+                trace['z'].insert(position + 1 + k, values)
+    else:
+        trace['y'][position] = groups.collapsed_labels[p]
+        for k in reversed(range(len(children))):
+            del trace['y'][position + 1 + k]
+            if splice_z:
+                del trace['z'][position + 1 + k]
+
+    # The row summary bars follow the displayed rows; the grouped view has few, so resend them
+    row_mean, row_data, _, _ = marginal_stats(snapshot, column_names, rows, value_range, 'grouped')
+    patch['data'][1]['x'] = row_mean
+    patch['data'][1]['y'] = y_axis_labels
+    patch['data'][1]['customdata'] = row_data
+    return patch
+
+def update_heatmap(selected_columns, value_range, selected_colorscale, screen_size_data,
+                   row_view='leaf', row_aggregate='mean', expanded_state=None, dataset_name=None,
+                   search_query=None):
+    try:
+        # Load data
+        dataset = datasets.get(dataset_name)
+        snapshot = dataset.table('example.json')
+        columns = canonical_columns(snapshot, selected_columns)
+        expanded = tuple(sorted((expanded_state or {}).get('expanded', [])))
+
+        screen_size = bucket_screen_size(screen_size_data)
+        trigger = triggered_id()
+
+        # Expanding a parent row only ships that parent's topics
+        toggled = (expanded_state or {}).get('toggled')
+        if row_view == 'grouped' and toggled and trigger == 'expanded-parents':
+            patch = expansion_patch(snapshot, columns, value_range, row_aggregate, expanded, toggled)
+            if search_query:
+                # Highlights move between a parent's row and its topics' rows
+                x_labels, y_labels, _, _ = search_highlights(snapshot, dataset.catalog(), search_query, columns, row_view, expanded)
+                patch['data'][SEARCH_TRACE]['x'] = x_labels
+                patch['data'][SEARCH_TRACE]['y'] = y_labels
+            return patch
+
+        # Colorscale, range and resize on their own keep the figure's structure: patch it in place
+        if trigger in PATCHED_INPUTS:
+            return restyle_patch(trigger, snapshot, columns, value_range, selected_colorscale, screen_size,
+                                 row_view, row_aggregate, expanded)
+
+        # Column, row-view and data changes rebuild; most of them are the same few default views,
+        # looked up by normalized inputs
+        view = ('grouped', row_aggregate, expanded) if row_view == 'grouped' else ('leaf',)
+        key = (columns, tuple(value_range), selected_colorscale, screen_size, view)
+        figure = dataset.figures.get(snapshot.version, key)
+        if figure is None:
+            fig = build_heatmap_figure(snapshot, columns, value_range, selected_colorscale, screen_size,
+                                       row_view, row_aggregate, expanded)
+            figure = dataset.figures.put(snapshot.version, key, heatmap_payload(fig))
+        # Cached figures are shared across searches; highlights go on a copy
+        if search_query:
+            x_labels, y_labels, _, _ = search_highlights(snapshot, dataset.catalog(), search_query, columns, row_view, expanded)
+            figure = with_highlights(figure, x_labels, y_labels)
+        return figure
 
     except Exception as e:
         logging.error(f"Error updating heatmap: {e}")
+        metrics.handled_exception()
         fig = go.Figure()
         fig.add_annotation(text="שגיאה בטעינת הנתונים. אנא נסה שוב מאוחר יותר.",
                            xref="paper", yref="paper",
@@ -477,15 +767,194 @@ def update_heatmap(selected_columns, value_range, selected_colorscale, screen_si
                            font=dict(size=20))
         return fig
 
+def heatmap_store_data(snapshot):
+    """Everything the client-side heatmap needs, shipped once per page load.
+
+    The base figure carries the full layout and trace styling with empty z/x;
+    the browser fills them in from the matrix for the current selection.
+    """
+    labels = label_table(snapshot)
+    fig = build_heatmap_figure(snapshot, (), [float('-inf'), float('inf')], 'R', None, marginals=False)
+    figure = json.loads(pio.to_json(fig, validate=False))
+    figure['data'][0]['z'] = []
+    figure['data'][0]['x'] = []
+    return {
+        'version': list(snapshot.version),
+        'columns': list(snapshot.columns),
+        'x_labels': [labels.x_labels[column] for column in snapshot.columns],
+        'z': snapshot.matrix.tolist(),
+        'colorscales': {option['value']: resolve_colorscale(option['value']) for option in COLORSCALE_OPTIONS},
+        'figure': figure,
+    }
+
+if HEATMAP_CLIENTSIDE:
+    @dashApp.callback(
+        Output('heatmap-data-store', 'data'),
+        Input('url', 'pathname'),
+        Input('dataset', 'value'),
+    )
+    @instrumented
+    def load_heatmap_store(pathname, dataset_name):
+        try:
+            return heatmap_store_data(datasets.get(dataset_name).table('example.json'))
+        except Exception as e:
+            logging.error(f"Error loading heatmap data: {e}")
+            metrics.handled_exception()
+            return dash.no_update
+
+    # Column selection, range masking, colorscale and resize run in the browser
+    dashApp.clientside_callback(
+        """
+        function(store, selectedColumns, valueRange, colorscale, screenSize) {
+            if (!store) {
+                return window.dash_clientside.no_update;
+            }
+            const selected = new Set(selectedColumns || []);
+            const positions = [];
+            store.columns.forEach(function(column, i) {
+                if (selected.size === 0 || selected.has(column)) {
+                    positions.push(i);
+                }
+            });
+            const minVal = valueRange[0];
+            const maxVal = valueRange[1];
+            const z = store.z.map(function(row) {
+                return positions.map(function(j) {
+                    const value = row[j];
+                    return (value !== null && value >= minVal && value <= maxVal) ? value : null;
+                });
+            });
+
+            const figure = JSON.parse(JSON.stringify(store.figure));
+            const trace = figure.data[0];
+            trace.z = z;
+            trace.x = positions.map(function(j) { return store.x_labels[j]; });
+            trace.colorscale = store.colorscales[colorscale] || store.colorscales['R'];
+            if (screenSize) {
+                figure.layout.width = screenSize.width * 0.8;
+                figure.layout.height = screenSize.height * 0.85;
+            }
+            return figure;
+        }
+        """,
+        Output('heatmap', 'figure'),
+        [
+            Input('heatmap-data-store', 'data'),
+            Input('column-checklist', 'value'),
+            Input('value-range-slider', 'value'),
+            Input('colorscale-dropdown', 'value'),
+            Input('screen-size-store', 'data'),
+        ],
+    )
+else:
+    dashApp.callback(
+        Output('heatmap', 'figure'),
+        [
+            Input('column-checklist', 'value'),
+            Input('value-range-slider', 'value'),
+            Input('colorscale-dropdown', 'value'),
+            Input('screen-size-store', 'data'),
+            Input('row-view', 'value'),
+            Input('row-aggregate', 'value'),
+            Input('expanded-parents', 'data'),
+            Input('dataset', 'value'),
+        ],
+        State('catalog-search', 'value'),
+        prevent_initial_call=False
+    )(instrumented(update_heatmap))
+
+    # Searching only moves the highlight markers of the figure already in the browser
+    @dashApp.callback(
+        Output('heatmap', 'figure', allow_duplicate=True),
+        Output('catalog-search-status', 'children'),
+        Input('catalog-search', 'value'),
+        State('column-checklist', 'value'),
+        State('row-view', 'value'),
+        State('expanded-parents', 'data'),
+        State('dataset', 'value'),
+        prevent_initial_call=True
+    )
+    @instrumented
+    def search_catalog(query, selected_columns, row_view, expanded_state, dataset_name=None):
+        try:
+            dataset = datasets.get(dataset_name)
+            snapshot = dataset.table('example.json')
+            columns = canonical_columns(snapshot, selected_columns)
+            expanded = (expanded_state or {}).get('expanded', [])
+            x_labels, y_labels, matches, hidden = search_highlights(
+                snapshot, dataset.catalog(), query, columns, row_view, expanded)
+        except Exception as e:
+            logging.error(f"Error searching the catalog: {e}")
+            metrics.handled_exception()
+            return dash.no_update, "שגיאה בחיפוש"
+        patch = dash.Patch()
+        patch['data'][SEARCH_TRACE]['x'] = x_labels
+        patch['data'][SEARCH_TRACE]['y'] = y_labels
+        if not query or not query.strip():
+            status = ""
+        elif hidden:
+            status = f"נמצאו {matches} תאים, {hidden} מהם אינם מוצגים"
+        else:
+            status = f"נמצאו {matches} תאים"
+        return patch, status
+
+    # Clicking an aggregated row of the grouped view expands or collapses its parent. Only those
+    # rows carry a ▸/▾ suffix; the browser drops every other click without a round trip
+    dashApp.clientside_callback(
+        """
+        function(clickData) {
+            const point = clickData && clickData.points && clickData.points[0];
+            if (!point || (point.curveNumber || 0) !== 0 || typeof point.y !== 'string' || !/[▸▾]$/.test(point.y)) {
+                return window.dash_clientside.no_update;
+            }
+            // A timestamp, so clicking the same row again still changes the store
+            return {y: point.y, time: Date.now()};
+        }
+        """,
+        Output('parent-row-click', 'data'),
+        Input('heatmap', 'clickData'),
+        prevent_initial_call=True
+    )
+
+    @dashApp.callback(
+        Output('expanded-parents', 'data'),
+        Input('parent-row-click', 'data'),
+        State('expanded-parents', 'data'),
+        State('dataset', 'value'),
+        prevent_initial_call=True
+    )
+    @instrumented
+    def toggle_parent_row(parent_click, expanded_state, dataset_name=None):
+        try:
+            y_label = parent_click['y']
+        except (KeyError, TypeError):
+            return dash.no_update
+        try:
+            parent = row_groups(datasets.get(dataset_name).table('example.json')).label_parent.get(y_label)
+        except Exception as e:
+            logging.error(f"Error toggling parent row: {e}")
+            metrics.handled_exception()
+            return dash.no_update
+        if parent is None:
+            return dash.no_update
+        expanded = list((expanded_state or {}).get('expanded', []))
+        if parent in expanded:
+            expanded.remove(parent)
+        else:
+            expanded.append(parent)
+        return {'expanded': expanded, 'toggled': parent}
+
 @dashApp.callback(
     [Output('column-checklist', 'options'),
      Output('column-checklist', 'value')],
     Input('select-all-button', 'n_clicks'),
+    Input('dataset', 'value'),
     State('column-checklist', 'options'),
 )
-def update_checklist_options(n_clicks, current_options):
+@instrumented
+def update_checklist_options(n_clicks, dataset_name=None, current_options=None):
     try:
-        df, _ = load_data('example.json')
+        df, _ = load_data('example.json', dataset_name)
         options = [{'label': "    " + key, 'value': key} for key in df.keys()]
         if n_clicks == 0:  # Initial state
             return options, []
@@ -495,33 +964,150 @@ def update_checklist_options(n_clicks, current_options):
             return options, []
     except Exception as e:
         logging.error(f"Error updating checklist options: {e}")
+        metrics.handled_exception()
         return [], []
 
-# Simplified modal toggle - only handle opening
+# ?dataset=<name> in the page URL picks the dataset; the dropdown lists the datasets available now
+@dashApp.callback(
+    Output('dataset', 'options'),
+    Output('dataset', 'value'),
+    Output('dataset-card', 'style'),
+    Input('url', 'search'),
+)
+@instrumented
+def select_dataset(search):
+    names = datasets.names()
+    requested = parse_qs((search or '').lstrip('?')).get('dataset', [None])[0]
+    value = requested if requested in names else datasets.default.name
+    style = {'margin-bottom': '20px', 'display': 'block' if len(names) > 1 else 'none'}
+    return [{'label': name, 'value': name} for name in names], value, style
+
+dashApp.clientside_callback(
+    """
+    function(dataset) {
+        return '/api/export.zip?' + new URLSearchParams({dataset: dataset || ''});
+    }
+    """,
+    Output('export-button', 'href'),
+    Input('dataset', 'value'),
+)
+
+# Rendered cell modals fetched from /api/modal, kept per page (LRU of promises, expiring after the TTL)
+CELL_MODAL_JS = """
+    const cellModal = window.cellModal = window.cellModal || {
+        cache: new Map(),
+        maxEntries: 200,
+        ttl: 300000,
+        timer: null,
+        get: function(x, y, dataset) {
+            const key = (dataset || '') + '\\u0000' + x + '\\u0000' + y;
+            const cached = this.cache.get(key);
+            this.cache.delete(key);
+            if (cached && Date.now() - cached.time < this.ttl) {
+                this.cache.set(key, cached);
+                return cached.body;
+            }
+            const params = new URLSearchParams({x: x, y: y, dataset: dataset || ''});
+            const body = fetch('/api/modal?' + params).then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            });
+            const cache = this.cache;
+            body.catch(function() { cache.delete(key); });
+            cache.set(key, {body: body, time: Date.now()});
+            if (cache.size > this.maxEntries) {
+                cache.delete(cache.keys().next().value);
+            }
+            return body;
+        }
+    };
+"""
+
+# Hovering a cell (debounced) prefetches its modal
+dashApp.clientside_callback(
+    """
+    function(hoverData, dataset) {
+    """ + CELL_MODAL_JS + """
+        if (!hoverData || !hoverData.points || !hoverData.points.length) {
+            return window.dash_clientside.no_update;
+        }
+        const point = hoverData.points[0];
+        if (point.curveNumber) {  // summary bars
+            return window.dash_clientside.no_update;
+        }
+        clearTimeout(cellModal.timer);
+        cellModal.timer = setTimeout(function() {
+            cellModal.get(point.x, point.y, dataset).catch(function() {});
+        }, 150);
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('modal-prefetch', 'data'),
+    Input('heatmap', 'hoverData'),
+    State('dataset', 'value'),
+    prevent_initial_call=True
+)
+
+# Clicking a cell opens its modal from the prefetched payload (no round trip), or after one
+# fetch; if that fails the server callbacks below render it from modal-click-data
+dashApp.clientside_callback(
+    """
+    function(clickData, dataset) {
+    """ + CELL_MODAL_JS + """
+        const noUpdate = window.dash_clientside.no_update;
+        if (!clickData || !clickData.points || !clickData.points.length) {
+            return [noUpdate, noUpdate, noUpdate, noUpdate];
+        }
+        const point = clickData.points[0];
+        if (point.curveNumber) {  // summary bars
+            return [noUpdate, noUpdate, noUpdate, noUpdate];
+        }
+        return cellModal.get(point.x, point.y, dataset).then(function(body) {
+            if (!body.open) {
+                return [noUpdate, noUpdate, noUpdate, noUpdate];
+            }
+            return [true, body.children, body.style, noUpdate];
+        }).catch(function() {
+            return [true, noUpdate, noUpdate, clickData];
+        });
+    }
+    """,
+    [Output('modal', 'is_open', allow_duplicate=True),
+     Output('modal', 'children', allow_duplicate=True),
+     Output('modal', 'style', allow_duplicate=True),
+     Output('modal-click-data', 'data', allow_duplicate=True)],
+    Input('heatmap', 'clickData'),
+    State('dataset', 'value'),
+    prevent_initial_call=True
+)
+
+# Test button opens the modal through the server path
 @dashApp.callback(
     [Output('modal', 'is_open'),
      Output('modal-click-data', 'data')],
-    [Input('heatmap', 'clickData'),
-     Input('test-modal-button', 'n_clicks')],
+    [Input('test-modal-button', 'n_clicks')],
     [State('modal', 'is_open')],
     prevent_initial_call=True
 )
-def toggle_modal(clickData, test_clicks, is_open):
+@instrumented
+def toggle_modal(test_clicks, is_open):
     """Simplified modal toggle with better click handling"""
     ctx = dash.callback_context
     
-    logging.info(f"toggle_modal called with clickData: {clickData}, is_open: {is_open}")
+    logging.debug("toggle_modal called with test_clicks: %s, is_open: %s", test_clicks, is_open)
     
     if not ctx.triggered:
-        logging.info("No trigger, returning existing state")
+        logging.debug("No trigger, returning existing state")
         return is_open, dash.no_update
     
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    logging.info(f"Trigger ID: {trigger_id}")
+    logging.debug("Trigger ID: %s", trigger_id)
     
     # Handle test button click
     if trigger_id == 'test-modal-button' and test_clicks:
-        logging.info("Test button clicked, creating mock click data")
+        logging.debug("Test button clicked, creating mock click data")
         mock_click_data = {
             'points': [{
                 'x': 'תקשורת וחשיבה דיגיטלית',
@@ -531,19 +1117,7 @@ def toggle_modal(clickData, test_clicks, is_open):
         }
         return True, mock_click_data
     
-    # Handle heatmap click
-    if trigger_id == 'heatmap' and clickData:
-        # Additional validation that we have valid click data
-        try:
-            point = clickData['points'][0]
-            if 'x' in point and 'y' in point:
-                logging.info(f"Valid click data found: x={point['x']}, y={point['y']}")
-                return True, clickData
-        except (KeyError, IndexError, TypeError) as e:
-            logging.warning(f"Invalid click data received: {e}")
-            return is_open, dash.no_update
-    
-    logging.info("No valid heatmap click, returning existing state")
+    logging.debug("No test click, returning existing state")
     return is_open, dash.no_update
 
 # Separate callback for closing the modal
@@ -552,10 +1126,11 @@ def toggle_modal(clickData, test_clicks, is_open):
     Input('close-modal', 'n_clicks'),
     prevent_initial_call=True
 )
+@instrumented
 def close_modal(close_clicks):
     """Handle closing the modal"""
     if close_clicks:
-        logging.info("Close button clicked, closing modal")
+        logging.debug("Close button clicked, closing modal")
         return False
     return dash.no_update
 
@@ -566,10 +1141,12 @@ def close_modal(close_clicks):
     [Output('modal', 'children'),
      Output('modal', 'style')],
     [Input('modal-click-data', 'data')],
-    [State('modal', 'is_open')],
+    [State('modal', 'is_open'),
+     State('dataset', 'value')],
     prevent_initial_call=True
 )
-def update_modal_content(stored_click_data, is_open):
+@instrumented
+def update_modal_content(stored_click_data, is_open, dataset_name=None):
     """Update modal content based on stored click data"""
     modal_style = {'direction': 'rtl'}
     
@@ -577,10 +1154,11 @@ def update_modal_content(stored_click_data, is_open):
         return [], modal_style
     
     try:
-        modal_content = update_modal_content_helper(stored_click_data)
+        modal_content = update_modal_content_helper(stored_click_data, dataset_name)
         return modal_content, modal_style
     except Exception as e:
         logging.error(f"Error generating modal content: {e}")
+        metrics.handled_exception()
         # Return error modal content
         return [
             dbc.ModalHeader(
@@ -597,20 +1175,19 @@ def update_modal_content(stored_click_data, is_open):
             ], className="border-0 pt-0", style={"direction": "rtl"})
         ], modal_style
 
-def update_modal_content_helper(clickData):
+def update_modal_content_helper(clickData, dataset_name=None):
     """Helper function to generate modal content from click data"""
     try:
         if not clickData:
             return []
         
         point = clickData['points'][0]
-        col_key = clean_html_string(point['x'])
-        row_key = original_row_key(point['y'])
-        
-        # Try both mappings since the structure might be reversed
-        figure_data = figure_map.get(col_key, {}).get(row_key)
-        if figure_data is None:
-            figure_data = figure_map.get(row_key, {}).get(col_key)
+        # Resolve the clicked labels to catalog keys through the precomputed reverse index
+        dataset = datasets.get(dataset_name)
+        labels = label_table(dataset.table('example.json'))
+        col_key, row_key = resolve_cell(labels, point['x'], point['y'])
+
+        figure_data = dataset.catalog().figure_map.get(col_key, {}).get(row_key)
         if figure_data is None:
             # Return a basic modal content when no figure data is found
             return [
@@ -631,55 +1208,10 @@ def update_modal_content_helper(clickData):
                 ], className="border-0 pt-0", style={"direction": "rtl"})
             ]
 
-        figure = figure_data['figure']
+        # A private copy of the pre-styled figure, safe to hand to this response
+        enhanced_figure = figure_data['figure']
         metadata = figure_data['metadata']
 
-        # Enhance the figure with better styling
-        enhanced_figure = figure
-        enhanced_figure.update_layout(
-            template="simple_white",
-            margin=dict(l=60, r=60, t=50, b=60),
-            height=450,
-            font=dict(size=22, family="Arial, sans-serif"),
-            hovermode="x unified",
-            plot_bgcolor="rgba(0,0,0,0)",
-            paper_bgcolor="white",
-            title_font=dict(size=26, family="Arial, sans-serif"),
-            xaxis=dict(
-                title_font=dict(size=22),
-                tickfont=dict(size=20)
-            ),
-            yaxis=dict(
-                title_font=dict(size=22),
-                tickfont=dict(size=20)
-            ),
-            legend=dict(
-                font=dict(size=20),
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
-        )
-        
-        # Apply Safe color palette based on chart type
-        if enhanced_figure.data:
-            trace = enhanced_figure.data[0]
-            
-            # Try to get Safe colors from plotly, fall back to our defined colors
-            try:
-                safe_colors = plotly.colors.qualitative.Safe
-            except AttributeError:
-                safe_colors = SAFE_COLORS
-            
-            if hasattr(trace, 'marker') and hasattr(trace.marker, 'color'):
-                # For bar charts and scatter plots
-                trace.marker.color = safe_colors[0]
-            elif hasattr(trace, 'marker') and hasattr(trace.marker, 'colors'):
-                # For pie charts
-                trace.marker.colors = safe_colors[:len(trace.labels) if hasattr(trace, 'labels') else 4]
-
         # Generate insight text based on data
         insight_text = f"💡 נתונים מעניינים עבור {col_key} ב{row_key}"
         if metadata.get("notes"):
@@ -695,7 +1227,11 @@ def update_modal_content_helper(clickData):
             metadata_badges.append(
                 dbc.Badge(f"שיטת מדידה", color="info", className="metadata-badge badge-info-custom")
             )
-        
+        if metadata.get("related_items"):
+            metadata_badges.append(
+                dbc.Badge(f"פריטים נוספים: {len(metadata['related_items'])}", color="info", className="metadata-badge badge-info-custom")
+            )
+
         # Add sample size badge (mock data)
         metadata_badges.append(
             dbc.Badge("n=1,200", color="secondary", className="metadata-badge badge-secondary-custom")
@@ -810,6 +1346,7 @@ def update_modal_content_helper(clickData):
         
     except Exception as e:
         logging.error(f"Error generating modal content: {e}")
+        metrics.handled_exception()
         return []
 
 @dashApp.callback(
@@ -818,6 +1355,7 @@ def update_modal_content_helper(clickData):
      Input('decrease-size-button', 'n_clicks')],
     State('heatmap-size', 'data')
 )
+@instrumented
 def update_heatmap_size(increase_clicks, decrease_clicks, current_size):
     try:
         # Start with current width and height
@@ -836,7 +1374,116 @@ def update_heatmap_size(increase_clicks, decrease_clicks, current_size):
         return {'width': int(new_width), 'height': int(new_height)}
     except Exception as e:
         logging.error(f"Error updating heatmap size: {e}")
+        metrics.handled_exception()
         return current_size
 
+# --- JSON API ---
+def requested_dataset():
+    """Dataset of an API request (?dataset=, the default when absent); KeyError if unknown."""
+    return datasets.get(request.args.get('dataset'))
+
+def unknown_dataset():
+    return jsonify({'error': 'unknown dataset', 'datasets': datasets.names()}), 404
+
+@app.route('/api/cell/<domain>/<metric>')
+def cell_detail(domain, metric):
+    """Metadata and chart of one heatmap cell as compact JSON, with a strong ETag."""
+    try:
+        dataset = requested_dataset()
+    except KeyError:
+        return unknown_dataset()
+    try:
+        entry = dataset.catalog().figure_map.cell_entry(domain, metric)
+    except KeyError:
+        return jsonify({'error': 'cell not found', 'domain': domain, 'metric': metric}), 404
+
+    # The figure is already serialized; splice it in rather than re-encoding it
+    header = json.dumps(
+        {'domain': domain, 'metric': metric, 'metadata': dict(entry.metadata)},
+        ensure_ascii=False, separators=(',', ':')
+    )
+    body = header[:-1] + ',"figure":' + entry.figure_json + '}'
+
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CELL_CACHE_MAX_AGE
+    return response.make_conditional(request)
+
+def modal_etag(dataset, x_label, y_label):
+    """ETag of the /api/modal response for a cell, derived without rendering it.
+
+    The modal depends on the labels and row groups of the data version, the
+    catalog generation, the cell's figure and metadata (entry.etag) and the
+    code rendering it.
+    """
+    snapshot = dataset.table('example.json')
+    catalog = dataset.catalog()
+    if row_groups(snapshot).label_parent.get(y_label) is not None:
+        cell = 'parent'
+    else:
+        col_key, row_key = resolve_cell(label_table(snapshot), x_label, y_label)
+        try:
+            cell = catalog.figure_map.cell_entry(col_key, row_key).etag
+        except KeyError:
+            cell = 'empty'
+    parts = (MODAL_RENDER_VERSION, dataset.name, snapshot.version, catalog.version, cell)
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+@app.route('/api/modal')
+def modal_content():
+    """Rendered modal of one heatmap cell (?x=&y= display labels), for hover prefetch and instant opening."""
+    x_label, y_label = request.args.get('x'), request.args.get('y')
+    if x_label is None or y_label is None:
+        return jsonify({'error': 'x and y are required'}), 400
+    try:
+        dataset = requested_dataset()
+    except KeyError:
+        return unknown_dataset()
+
+    # Revalidated on every use: the ETag turns repeat fetches into 304s, reloaded data is never stale.
+    # It is known before rendering, so a revalidation that matches renders nothing
+    etag = modal_etag(dataset, x_label, y_label)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+    # Aggregated rows of the grouped view drill down instead of opening the modal
+    if row_groups(dataset.table('example.json')).label_parent.get(y_label) is not None:
+        body = {'open': False}
+    else:
+        children = update_modal_content_helper({'points': [{'x': x_label, 'y': y_label}]}, dataset.name)
+        body = {'open': True, 'children': children, 'style': {'direction': 'rtl'}}
+
+    response = app.response_class(pio.json.to_json_plotly(body), mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/export.zip')
+def export_bundle():
+    """The heatmap and every cell chart as one zip (?format=png|svg|pdf|html&dataset=), streamed while it renders."""
+    fmt = request.args.get('format', DEFAULT_FORMAT)
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'unsupported format', 'formats': list(EXPORT_FORMATS)}), 400
+    try:
+        dataset = requested_dataset()
+    except KeyError:
+        return unknown_dataset()
+
+    snapshot = dataset.table('example.json')
+    catalog = dataset.catalog()
+
+    def heatmap_figure():
+        fig = build_heatmap_figure(snapshot, (), [float('-inf'), float('inf')], 'R', None)
+        return pio.to_json(fig, validate=False)
+
+    chunks = stream_export(catalog, heatmap_figure, (snapshot.version, catalog.version), fmt, dataset.name)
+    response = app.response_class(stream_with_context(chunks), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="skills-dashboard-{dataset.name}.{fmt}.zip"'
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True, port=8051)
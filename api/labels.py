@@ -0,0 +1,118 @@
+import re
+from collections import namedtuple
+from types import MappingProxyType
+
+from .data_store import DerivedTables
+from .figures_map import normalize
+
+
+# --- Text Handling ---
+def update_y_axis_categories_with_extra_column(y_labels):
+    """Update y-axis labels."""
+    updated_labels = []
+    for label in y_labels:
+        if " " in label:
+            parent_category, subcategory = label.rsplit(" ", 1)
+            updated_label = f"<b>{parent_category}</b> | {subcategory}"
+        else:
+            updated_label = label
+        updated_labels.append(updated_label)
+    return updated_labels
+
+def clean_html_string(html_string):
+    if html_string is None:
+        return ""
+    # קודם כל להחליף תגיות <br> ברווח, כדי שלא ייעלמו
+    text = re.sub(r'<br\s*/?>', ' ', html_string)
+    # אחר-כך להסיר את כל שאר התגיות
+    text = re.sub(r'<.*?>', '', text)
+    # להמיר מפריד אנכי לרווח
+    text = re.sub(r'\s*\|\s*', ' ', text)
+    # לצמצם רווחים מיותרים
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def convert_AI_label(y_axis_labels):
+    """Replace "AI" with "בינה מלאכותית"."""
+    for i in range(len(y_axis_labels)):
+        if "AI" in y_axis_labels[i]:
+            y_axis_labels[i] = y_axis_labels[i].replace("AI", "<b>בינה מלאכותית</b>")
+
+def original_row_key(y_label):
+    txt = clean_html_string(y_label)
+    if "|" in y_label:
+        txt = txt.split("|")[0]
+    return txt.strip()
+
+def change_x_labels(x_labels):
+    x_axis_labels_modified = []
+    for label in x_labels:
+        if " " in label:  # Check for multiple words
+            modified_label = label.replace(" ", "<br>") # Insert <br> tag
+            x_axis_labels_modified.append(modified_label)
+        else:
+            x_axis_labels_modified.append(label)
+    return ['<b>' + label + '</b>' for label in x_axis_labels_modified]
+
+
+# --- Label tables ---
+# Display labels of one data version together with their reverse index.
+#   x_labels - column name -> formatted x-axis label
+#   y_labels - formatted y-axis labels, in index order
+#   x_keys   - formatted x-axis label -> catalog domain key
+#   y_keys   - formatted y-axis label -> catalog metric key
+#   x_by_key - catalog domain key -> column name
+#   row_by_key - catalog metric key -> row position
+LabelTable = namedtuple('LabelTable', ['version', 'x_labels', 'y_labels', 'x_keys', 'y_keys', 'x_by_key', 'row_by_key'])
+
+
+def catalog_metric_key(topic):
+    """Catalog key of a y-axis topic, as it reads once "AI" is spelled out."""
+    return normalize(topic.replace("AI", "בינה מלאכותית"))
+
+
+def build_label_table(snapshot):
+    columns = list(snapshot.columns)
+    x_display = change_x_labels(columns)
+    y_display = update_y_axis_categories_with_extra_column(snapshot.index)
+    convert_AI_label(y_display)
+
+    x_keys = {label: normalize(column) for label, column in zip(x_display, columns)}
+    y_keys = {label: catalog_metric_key(topic) for label, topic in zip(y_display, snapshot.index)}
+    x_by_key, row_by_key = {}, {}
+    for column in columns:
+        x_by_key.setdefault(normalize(column), column)
+    for row, topic in enumerate(snapshot.index):
+        row_by_key.setdefault(catalog_metric_key(topic), row)
+    return LabelTable(
+        snapshot.version,
+        MappingProxyType(dict(zip(columns, x_display))),
+        tuple(y_display),
+        MappingProxyType(x_keys),
+        MappingProxyType(y_keys),
+        MappingProxyType(x_by_key),
+        MappingProxyType(row_by_key),
+    )
+
+
+_label_tables = DerivedTables(build_label_table)
+
+
+def label_table(snapshot):
+    """Return the LabelTable of a snapshot, built once per data version."""
+    return _label_tables.get(snapshot)
+
+
+def resolve_cell(table, x_label, y_label):
+    """Map clicked axis labels to (domain, metric) catalog keys.
+
+    Labels rendered by the heatmap resolve through the reverse index; anything
+    else (e.g. hand-built click data) falls back to stripping the HTML markup.
+    """
+    domain = table.x_keys.get(x_label)
+    if domain is None:
+        domain = normalize(clean_html_string(x_label))
+    metric = table.y_keys.get(y_label)
+    if metric is None:
+        metric = normalize(original_row_key(y_label))
+    return domain, metric
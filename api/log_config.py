@@ -0,0 +1,136 @@
+"""Logging setup for the dashboard.
+
+Two modes, chosen with LOG_MODE:
+
+    sync   (default) the original development setup: DEBUG to stderr, inline
+    async  production setup: records are handed to a queue and written by a
+           background thread, so callbacks never block on formatting or I/O
+
+Both modes honour:
+
+    LOG_LEVEL              root level (sync: DEBUG, async: INFO)
+    LOG_LEVELS             per-logger levels, e.g. "werkzeug=WARNING,dash=INFO"
+    LOG_DEBUG_SAMPLE_RATE  fraction of DEBUG records kept, between 0 and 1 (default 1)
+
+Every record carries the correlation id of the Flask request it was logged
+from (`request_id`), taken from the X-Request-ID header or generated.
+"""
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+
+from flask import request
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+# Loggers that are too chatty for production unless overridden by LOG_LEVELS
+QUIET_LOGGERS = {'werkzeug': 'WARNING', 'dash': 'WARNING', 'urllib3': 'WARNING'}
+
+request_id = contextvars.ContextVar('request_id', default='-')
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request's correlation id to every record."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keep only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records as logged, leaving message and traceback formatting to the listener thread.
+
+    The stock QueueHandler formats every record on the calling thread so it
+    can be pickled; this queue stays in-process, so msg, args and exc_info
+    are handed over as they are.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def parse_levels(spec):
+    """Parse "name=LEVEL,name=LEVEL" into a dict."""
+    levels = {}
+    for part in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = part.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(mode=None):
+    """Configure the root logger for the given (or LOG_MODE) mode."""
+    global _listener
+    mode = mode or os.environ.get('LOG_MODE', 'sync')
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    stop_listener()
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    filters = [RequestIdFilter(), DebugSampler(float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1)))]
+
+    if mode == 'async':
+        root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        levels = dict(QUIET_LOGGERS)
+        # Callers only enqueue the record; formatting and writing happen on the listener thread
+        handler = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+    else:
+        root.setLevel(os.environ.get('LOG_LEVEL', 'DEBUG').upper())
+        levels = {}
+        handler = stream
+
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+    root.addHandler(handler)
+
+    levels.update(parse_levels(os.environ.get('LOG_LEVELS', '')))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    return mode
+
+
+def stop_listener():
+    """Flush and stop the background writer of async mode, if running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def install_request_ids(server):
+    """Give every Flask request a correlation id and echo it in the response."""
+
+    @server.before_request
+    def assign_request_id():
+        request_id.set(request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16])
+
+    @server.after_request
+    def echo_request_id(response):
+        response.headers['X-Request-ID'] = request_id.get()
+        return response
+
+
+atexit.register(stop_listener)
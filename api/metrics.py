@@ -0,0 +1,198 @@
+"""Per-callback latency, payload and cache metrics in Prometheus text format.
+
+Callbacks are wrapped with `instrumented`, which records their latency and
+raised exceptions; callbacks that catch an exception and answer with a
+fallback count it with `handled_exception()`. Response sizes are measured on the way out of Flask, so
+they are the real bytes of each /_dash-update-component response. Cache
+statistics are pulled from registered collectors when /metrics is scraped.
+"""
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from dash.exceptions import PreventUpdate
+from flask import request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a single label value."""
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, (counts, total) in sorted(self._series.items()):
+                label = f'{self.label}="{escape(label_value)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{label}}} {total}')
+                lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a single label value."""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value):
+        with self._lock:
+            return self._values.get(label_value, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{escape(label_value)}"}} {value}')
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+callback_latency = Histogram(
+    'dash_callback_duration_seconds', "Server-side callback latency.", 'callback', LATENCY_BUCKETS)
+callback_payload = Histogram(
+    'dash_callback_response_bytes', "Size of callback responses.", 'callback', PAYLOAD_BUCKETS)
+callback_exceptions = Counter(
+    'dash_callback_exceptions_total', "Exceptions raised by callbacks or caught and answered with a fallback.",
+    'callback')
+
+# Name of the instrumented callback running in this context
+current_callback = contextvars.ContextVar('current_callback', default=None)
+
+# (cache name, stats callable) pairs; stats() returns 'hits' and 'misses' (or 'parses')
+_collectors = []
+
+# (metric name, type, help text, value callable) of counters and gauges kept by other components
+_values = []
+
+
+def register_cache(name, stats):
+    """Export hit/miss counters and the hit ratio of a cache exposing a stats() callable."""
+    _collectors.append((name, stats))
+
+
+def register_counter(name, help_text, value):
+    """Export a monotonic counter whose current value is read from value() when /metrics is scraped."""
+    _values.append((name, 'counter', help_text, value))
+
+
+def register_gauge(name, help_text, value):
+    """Export a gauge whose current value is read from value() when /metrics is scraped."""
+    _values.append((name, 'gauge', help_text, value))
+
+
+def instrumented(func):
+    """Record latency and exceptions of a Dash callback under its function name."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        token = current_callback.set(name)
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            callback_exceptions.inc(name)
+            raise
+        finally:
+            current_callback.reset(token)
+            callback_latency.observe(name, time.perf_counter() - start)
+
+    return wrapper
+
+
+def handled_exception():
+    """Count an exception the running callback caught and answered with a fallback (no-op outside callbacks)."""
+    name = current_callback.get()
+    if name is not None:
+        callback_exceptions.inc(name)
+
+
+def render_caches():
+    lines = []
+    families = {
+        'dashboard_cache_hits_total': ('counter', "Cache hits."),
+        'dashboard_cache_misses_total': ('counter', "Cache misses (including parses of changed files)."),
+        'dashboard_cache_hit_ratio': ('gauge', "Hits over lookups since start."),
+    }
+    samples = {family: [] for family in families}
+    for name, stats in _collectors:
+        values = stats()
+        hits = values.get('hits', 0)
+        misses = values.get('misses', values.get('parses', 0))
+        lookups = hits + misses
+        samples['dashboard_cache_hits_total'].append((name, hits))
+        samples['dashboard_cache_misses_total'].append((name, misses))
+        samples['dashboard_cache_hit_ratio'].append((name, hits / lookups if lookups else 0.0))
+    for family, (kind, help_text) in families.items():
+        lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}"]
+        lines += [f'{family}{{cache="{escape(name)}"}} {value}' for name, value in samples[family]]
+    return lines
+
+
+def render_values():
+    lines = []
+    for name, kind, help_text, value in _values:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value()}"]
+    return lines
+
+
+def render():
+    lines = (callback_latency.render() + callback_payload.render() + callback_exceptions.render()
+             + render_caches() + render_values())
+    return '\n'.join(lines) + '\n'
+
+
+def install(server, dash_app, path='/metrics'):
+    """Measure callback response sizes and serve the metrics on the Flask server."""
+
+    @server.after_request
+    def record_callback_payload(response):
+        if request.path.endswith('/_dash-update-component') and response.status_code == 200:
+            body = request.get_json(silent=True) or {}
+            entry = dash_app.callback_map.get(body.get('output'))
+            name = entry['callback'].__name__ if entry else 'unknown'
+            callback_payload.observe(name, response.calculate_content_length() or 0)
+        return response
+
+    @server.route(path)
+    def metrics():
+        return server.response_class(render(), mimetype='text/plain; version=0.0.4')
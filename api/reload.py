@@ -0,0 +1,111 @@
+"""Hot reload of the data directory without a redeploy.
+
+A daemon thread polls the data files every RELOAD_INTERVAL seconds (0
+disables it). When one changes it rebuilds everything derived from it off
+the request path, in this order:
+
+    1. the compiled binary snapshot, if the directory has one (by one
+       process; the others serve the changed files from JSON meanwhile)
+    2. the parsed tables of the DataStore
+    3. the catalog and its lazy figure map
+    4. registered warm-up hooks (label tables, row groups, ...)
+
+Each step swaps in a complete, immutable object, so a callback sees either
+the previous data or the new data, never a half-built mix. If a rebuild
+fails (for example on a half-written file) the old data keeps being served
+and the change is retried on the next poll.
+"""
+import logging
+import os
+import threading
+
+from .data_store import DATA_DIR, file_version, store
+from .figures_map import CATALOG_FILE, build_catalog, swap_catalog
+from .snapshot import SOURCE_FILES, load_snapshot, refresh_snapshot
+
+RELOAD_INTERVAL = float(os.environ.get('RELOAD_INTERVAL', 5))
+
+
+class DataWatcher:
+    """Poll the data files and reload whatever changed."""
+
+    def __init__(self, data_dir=DATA_DIR, interval=RELOAD_INTERVAL, files=SOURCE_FILES):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.files = files
+        self.reloads = 0
+        self.failures = 0
+        self._hooks = []
+        self._versions = self.versions()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def versions(self):
+        versions = {}
+        for name in self.files:
+            try:
+                versions[name] = file_version(os.path.join(self.data_dir, name))
+            except OSError:
+                versions[name] = None
+        return versions
+
+    def on_reload(self, hook):
+        """Call hook(changed_names) after every successful reload, still off the request path."""
+        self._hooks.append(hook)
+        return hook
+
+    def poll(self):
+        """Reload the files changed since the last successful reload; return their names."""
+        versions = self.versions()
+        changed = [name for name in self.files if versions[name] != self._versions.get(name)]
+        if not changed:
+            return []
+        try:
+            self.reload(changed)
+        except Exception as e:
+            self.failures += 1
+            logging.error(f"Error reloading {', '.join(changed)}: {e}")
+            return []
+        self._versions = versions
+        self.reloads += 1
+        logging.info(f"Reloaded {', '.join(changed)}")
+        return changed
+
+    def reload(self, changed):
+        compiled = load_snapshot(self.data_dir)
+        if compiled is not None and not all(compiled.is_fresh(name, self.data_dir) for name in changed):
+            # Every worker watches the same directory: one of them recompiles (into a temporary file
+            # that is renamed, so mapped old snapshots stay valid) and the others read JSON meanwhile
+            refresh_snapshot(self.data_dir, changed)
+        store.refresh()
+        if CATALOG_FILE in changed:
+            swap_catalog(build_catalog(self.data_dir))
+        for hook in self._hooks:
+            hook(changed)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        """Start polling in a daemon thread (again after a fork, where threads do not survive)."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='data-watcher', daemon=True)
+        self._thread.start()
+        store.watched = True
+        return self
+
+    def stop(self):
+        self._stop.set()
+        store.watched = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {'reloads': self.reloads, 'failures': self.failures}
+
+
+watcher = DataWatcher()
@@ -0,0 +1,128 @@
+"""Full-text search over the measurement catalog.
+
+An inverted index from terms to heatmap cells is built once per catalog
+generation. Text is folded before indexing and querying: whitespace and
+direction marks are normalized like normalize(), niqqud and cantillation
+are stripped, Latin text is lower-cased and Hebrew final letters are
+mapped to their regular forms. A Hebrew word is also indexed and looked up
+without a leading one-letter prefix (ו, ה, ב, ל, מ, ש, כ), so "ובריאות" is
+found by "בריאות" and the other way round.
+
+The vocabulary is sorted and the postings of all terms are stored back to
+back, so the cells of every term starting with a prefix are one
+contiguous slice. A query matches cells containing all of its words; the
+last word also matches as a prefix, for search-as-you-type.
+"""
+import re
+import threading
+import weakref
+from bisect import bisect_left
+
+import numpy as np
+
+from .figures_map import normalize
+
+SEARCH_FIELDS = ('סעיף / היגד על', 'פריט/היגד מקורי', 'מקור', 'הערות')
+
+# Shortest last word that is expanded as a prefix; shorter words must match exactly
+MIN_PREFIX = 2
+
+# Points and cantillation; maqaf and sof pasuq are punctuation and still split words
+NIQQUD = re.compile('[\u0591-\u05bd\u05bf\u05c1\u05c2\u05c4\u05c5\u05c7]')
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+TOKEN = re.compile(r'\w+')
+HEBREW_PREFIXES = frozenset('והבלמשכ')
+HEBREW_LETTER = re.compile('[\u05d0-\u05ea]')
+
+# id of a catalog's figure map -> its SearchIndex. The figure map is the weakly referenceable
+# part of a catalog generation; its finalizer drops the index along with the generation
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def fold(text):
+    return NIQQUD.sub('', normalize(text).replace('\u200e', '')).lower().translate(FINAL_LETTERS)
+
+
+def tokens(text):
+    return TOKEN.findall(fold(text))
+
+
+def index_terms(token):
+    yield token
+    if len(token) > 3 and token[0] in HEBREW_PREFIXES and HEBREW_LETTER.match(token[1]):
+        yield token[1:]
+
+
+class SearchIndex:
+    """Inverted index of catalog text: term -> cells, with prefix lookup."""
+
+    def __init__(self, cell_items, fields=SEARCH_FIELDS):
+        # Cell ids in catalog order; cells[i] is the (domain, metric) key pair of cell i
+        self.cells = []
+        postings = {}
+        for domain, metrics in cell_items.items():
+            for metric, items in metrics.items():
+                cell = len(self.cells)
+                self.cells.append((domain, metric))
+                for item in items:
+                    for field in fields:
+                        value = item.get(field)
+                        if not isinstance(value, str):
+                            continue
+                        for token in tokens(value):
+                            for term in index_terms(token):
+                                postings.setdefault(term, set()).add(cell)
+
+        self.terms = sorted(postings)
+        lists = [sorted(postings[term]) for term in self.terms]
+        self.offsets = np.zeros(len(lists) + 1, dtype=np.intp)
+        np.cumsum([len(cells) for cells in lists], out=self.offsets[1:])
+        self.postings = np.fromiter((cell for cells in lists for cell in cells), dtype=np.int32,
+                                    count=int(self.offsets[-1]))
+
+    def lookup(self, word, prefix=False):
+        """Sorted ids of the cells containing word (or, with prefix, any term starting with it)."""
+        start = bisect_left(self.terms, word)
+        if prefix:
+            end = bisect_left(self.terms, word + '\uffff', lo=start)
+        else:
+            end = start + 1 if start < len(self.terms) and self.terms[start] == word else start
+        cells = self.postings[self.offsets[start]:self.offsets[end]]
+        if end - start <= 1:
+            return cells
+        # Union of the prefix's postings: mark cells instead of sorting the slice
+        mask = np.zeros(len(self.cells), dtype=bool)
+        mask[cells] = True
+        return np.flatnonzero(mask).astype(np.int32)
+
+    def search(self, query):
+        """(domain, metric) keys of the cells matching every word of query, in catalog order."""
+        words = tokens(query or '')
+        matches = None
+        for n, word in enumerate(words):
+            # A prefixed query word ("ובתפעול") also matches the bare word, like the indexed text
+            found = None
+            for term in index_terms(word):
+                cells = self.lookup(term, prefix=n == len(words) - 1 and len(term) >= MIN_PREFIX)
+                found = cells if found is None else np.union1d(found, cells)
+            matches = found if matches is None else np.intersect1d(matches, found, assume_unique=True)
+            if not len(matches):
+                break
+        if matches is None:
+            return []
+        return [self.cells[cell] for cell in matches.tolist()]
+
+
+def search_index(catalog):
+    """The SearchIndex of a catalog generation, built once."""
+    key = id(catalog.figure_map)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = SearchIndex(catalog.cell_items)
+            weakref.finalize(catalog.figure_map, _indexes.pop, key, None)
+        return index
@@ -0,0 +1,377 @@
+"""Compiled binary snapshot of the dashboard's JSON data files.
+
+Parsing JSON on every cold start is the slowest part of bringing a worker
+up. This module compiles the list-of-records files under public/ into one
+versioned file that is memory-mapped at startup:
+
+    python -m api.snapshot [--data-dir public]
+
+Layout (little endian, sections 8-byte aligned):
+
+    preamble  MAGIC, FORMAT_VERSION (uint32), header length (uint32)
+    header    UTF-8 JSON: source sizes/mtimes/digests and section offsets
+    sections  strings.offsets  uint32 (n + 1) byte offsets into strings.data
+              strings.data     every distinct string once, UTF-8
+              <file>.keys      int32 string ids of the record keys
+              <file>.kinds     uint8 (records x keys) value kind, see KIND_*
+              <file>.cells     int32 (records x keys) string id of text values
+              <file>.values    float64 (records x keys) numeric values
+
+A snapshot is only used for a file whose current size and digest match the
+ones recorded at build time (the digest is only computed when the mtime
+differs too); otherwise callers fall back to the JSON file.
+
+Files are read back column by column straight from the arrays, and only
+the strings a column uses are decoded, each distinct one once. Files under
+SNAPSHOT_MIN_BYTES are recorded for freshness but not compiled (has() is
+False for them): json.load is faster on files that small.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process compile lock
+    fcntl = None
+
+MAGIC = b'SKDSNAP\0'
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+ALIGNMENT = 8
+
+SNAPSHOT_NAME = 'data.snapshot'
+# Smaller files are only recorded, not compiled: the JSON parser loads them faster than a mapped snapshot
+SNAPSHOT_MIN_BYTES = int(os.environ.get('SNAPSHOT_MIN_BYTES', 128 * 1024))
+# Held by the one process recompiling the snapshot of a data directory
+LOCK_NAME = 'data.snapshot.lock'
+SOURCE_FILES = ('example.json', 'measurement_map.json', 'TXT.json')
+
+# Value kinds of a record cell
+KIND_MISSING, KIND_STRING, KIND_INT, KIND_FLOAT, KIND_JSON = range(5)
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+class StringTable:
+    """Interns strings to dense ids while a snapshot is being compiled."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def encode(self):
+        data = bytearray()
+        offsets = [0]
+        for text in self.strings:
+            data += text.encode('utf-8')
+            offsets.append(len(data))
+        return np.array(offsets, dtype='<u4'), bytes(data)
+
+
+def encode_records(records, strings):
+    """Encode a list of records into (keys, kinds, cells, values) arrays."""
+    keys = []
+    for record in records:
+        for key in record:
+            if key not in keys:
+                keys.append(key)
+    shape = (len(records), len(keys))
+    kinds = np.zeros(shape, dtype='u1')
+    cells = np.full(shape, -1, dtype='<i4')
+    values = np.full(shape, np.nan, dtype='<f8')
+    for i, record in enumerate(records):
+        for j, key in enumerate(keys):
+            if key not in record:
+                continue
+            value = record[key]
+            if isinstance(value, str):
+                kinds[i, j] = KIND_STRING
+                cells[i, j] = strings.add(value)
+            elif isinstance(value, bool) or value is None or not isinstance(value, (int, float)):
+                kinds[i, j] = KIND_JSON
+                cells[i, j] = strings.add(json.dumps(value, ensure_ascii=False))
+            else:
+                kinds[i, j] = KIND_INT if isinstance(value, int) else KIND_FLOAT
+                values[i, j] = value
+    key_ids = np.array([strings.add(key) for key in keys], dtype='<i4')
+    return key_ids, kinds, cells, values
+
+
+def compile_snapshot(data_dir, files=SOURCE_FILES):
+    """Compile the given JSON files of data_dir into its snapshot file and return the path."""
+    output = os.path.join(data_dir, SNAPSHOT_NAME)
+    strings = StringTable()
+    sources = {}
+    arrays = []
+    for name in files:
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            continue
+        # Stat before reading: a file changed meanwhile fails the mtime check and is hashed
+        stat = os.stat(path)
+        sources[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': file_digest(path)}
+        if stat.st_size < SNAPSHOT_MIN_BYTES:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        key_ids, kinds, cells, values = encode_records(records, strings)
+        arrays += [(f'{name}.keys', key_ids), (f'{name}.kinds', kinds),
+                   (f'{name}.cells', cells), (f'{name}.values', values)]
+    offsets, string_data = strings.encode()
+    arrays = [('strings.offsets', offsets), ('strings.data', np.frombuffer(string_data, dtype='u1'))] + arrays
+
+    # Lay the sections out relative to the end of the header
+    sections = {}
+    position = 0
+    for section, array in arrays:
+        position += -position % ALIGNMENT
+        sections[section] = {'offset': position, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        position += array.nbytes
+    header = json.dumps({'sources': sources, 'sections': sections}, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(PREAMBLE.size + len(header)) % ALIGNMENT)
+    base = PREAMBLE.size + len(header)
+
+    # A temporary file of our own, renamed over the output: concurrent compiles never
+    # write to a file another process has published or mapped
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(output) or '.', prefix=os.path.basename(output) + '.',
+                                      suffix='.tmp', delete=False)
+    try:
+        with tmp as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for section, array in arrays:
+                f.seek(base + sections[section]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, output)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    return output
+
+
+def refresh_snapshot(data_dir, names=SOURCE_FILES):
+    """Recompile the snapshot of data_dir unless it is fresh for names; return whether it is fresh now.
+
+    Only one process compiles at a time. Others return False at once instead
+    of compiling the same data again; until the new snapshot is published
+    their changed files fail is_fresh and are read from JSON.
+    """
+    if fcntl is None:
+        compile_snapshot(data_dir)
+        return True
+    with open(os.path.join(data_dir, LOCK_NAME), 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        # Another process may have just published a fresh one
+        compiled = load_snapshot(data_dir)
+        if compiled is None or not all(compiled.is_fresh(name, data_dir) for name in names):
+            compile_snapshot(data_dir)
+        return True
+
+
+# Placeholder of a missing cell while a file is read column by column
+MISSING = object()
+
+
+class CompiledSnapshot:
+    """Read-only, memory-mapped view of a compiled snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} snapshot")
+        header = json.loads(bytes(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length]))
+        self.sources = header['sources']
+        self._sections = header['sections']
+        self._base = PREAMBLE.size + header_length
+        # (mtime_ns, size) of source files whose digest was checked, so each version is hashed once
+        self._verified = {}
+
+        self._offsets = self.array('strings.offsets')
+        self._string_data = memoryview(self._mmap)[self._base + self._sections['strings.data']['offset']:]
+
+    def array(self, section):
+        """Zero-copy NumPy view of a section."""
+        info = self._sections[section]
+        dtype = np.dtype(info['dtype'])
+        count = math.prod(info['shape'])
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._base + info['offset'])
+        return array.reshape(info['shape'])
+
+    def has(self, name):
+        """True when the records of `name` are compiled into the snapshot."""
+        return f'{name}.keys' in self._sections
+
+    def is_fresh(self, name, data_dir):
+        """True when the snapshot has seen `name` and the JSON file has not changed since."""
+        source = self.sources.get(name)
+        if source is None:
+            return False
+        path = os.path.join(data_dir, name)
+        try:
+            stat = os.stat(path)
+            if stat.st_size != source['size']:
+                return False
+            version = (stat.st_mtime_ns, stat.st_size)
+            if stat.st_mtime_ns == source.get('mtime_ns') or self._verified.get(name) == version:
+                return True
+            # Touched or copied: only the content tells
+            if file_digest(path) != source['digest']:
+                return False
+            self._verified[name] = version
+            return True
+        except OSError:
+            return False
+
+    def strings(self, ids):
+        """Decoded strings of an array of string ids; every distinct string is decoded once and shared."""
+        if not len(ids):
+            return []
+        unique, inverse = np.unique(ids, return_inverse=True)
+        starts = self._offsets[unique].tolist()
+        ends = self._offsets[unique + 1].tolist()
+        data = self._string_data
+        decoded = [str(data[start:end], 'utf-8') for start, end in zip(starts, ends)]
+        return [decoded[i] for i in inverse.ravel().tolist()]
+
+    def _columns(self, name):
+        """(keys, kinds, columns) of a compiled file; columns hold MISSING where a record lacks a key."""
+        keys = self.strings(self.array(f'{name}.keys'))
+        kinds = self.array(f'{name}.kinds')
+        cells = self.array(f'{name}.cells')
+        values = self.array(f'{name}.values')
+        if not len(kinds):
+            return keys, kinds, [[] for _ in keys]
+        lows, highs = kinds.min(axis=0).tolist(), kinds.max(axis=0).tolist()
+        columns = []
+        for j, (low, high) in enumerate(zip(lows, highs)):
+            if low == high == KIND_INT:
+                columns.append(values[:, j].astype(np.int64).tolist())
+            elif low == high == KIND_FLOAT:
+                columns.append(values[:, j].tolist())
+            elif low == high == KIND_STRING:
+                columns.append(self.strings(cells[:, j]))
+            else:
+                columns.append(self._mixed_column(kinds[:, j], cells[:, j], values[:, j]))
+        return keys, kinds, columns
+
+    def _mixed_column(self, kinds, cells, values):
+        # Decode the text cells together, then convert cell by cell
+        texts = iter(self.strings(cells[cells >= 0]))
+        column = []
+        for kind, value in zip(kinds.tolist(), values.tolist()):
+            if kind == KIND_MISSING:
+                column.append(MISSING)
+            elif kind == KIND_STRING:
+                column.append(next(texts))
+            elif kind == KIND_JSON:
+                column.append(json.loads(next(texts)))
+            else:
+                column.append(int(value) if kind == KIND_INT else value)
+        return column
+
+    def iter_records(self, name):
+        """Rebuild the records of a compiled file one at a time."""
+        keys, kinds, columns = self._columns(name)
+        if (kinds != KIND_MISSING).all():
+            yield from map(dict, map(zip, itertools.repeat(keys), zip(*columns)))
+            return
+        for row in zip(*columns):
+            yield {key: value for key, value in zip(keys, row) if value is not MISSING}
+
+    def records(self, name):
+        """Rebuild the list of records of a compiled file."""
+        return list(self.iter_records(name))
+
+    def table(self, name, index_column):
+        """Columnar view of a compiled file: (columns, index, matrix).
+
+        matrix is a zero-copy view of the numeric columns, or None when the
+        file has non-numeric columns besides the index column.
+        """
+        keys, kinds, column_values = self._columns(name)
+        columns = {key: tuple(None if value is MISSING else value for value in column) if MISSING in column
+                   else tuple(column) for key, column in zip(keys, column_values)}
+        index = columns.pop(index_column, None)
+        numeric = [j for j, key in enumerate(keys) if key != index_column]
+        matrix = None
+        if numeric and len(kinds) and KIND_INT <= kinds[:, numeric].min() and kinds[:, numeric].max() <= KIND_FLOAT:
+            values = self.array(f'{name}.values')
+            if numeric == list(range(numeric[0], numeric[0] + len(numeric))):
+                matrix = values[:, numeric[0]:numeric[-1] + 1]
+            else:
+                matrix = values[:, numeric]
+                matrix.setflags(write=False)
+        return columns, index, matrix
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_snapshot(data_dir):
+    """Return the CompiledSnapshot of data_dir, or None when there is no usable one."""
+    path = os.path.join(data_dir, SNAPSHOT_NAME)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            compiled = CompiledSnapshot(path)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring data snapshot {path}: {e}")
+            compiled = None
+        _loaded[path] = (version, compiled)
+        return compiled
+
+
+def forget_snapshot(data_dir):
+    """Drop the loaded snapshot of data_dir; views handed out earlier stay valid."""
+    with _loaded_lock:
+        _loaded.pop(os.path.join(data_dir, SNAPSHOT_NAME), None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the dashboard's JSON data into a binary snapshot.")
+    parser.add_argument('--data-dir', default=os.environ.get('SKILLS_DATA_DIR', 'public'), help="directory holding the JSON files (default: %(default)s)")
+    args = parser.parse_args(argv)
+    path = compile_snapshot(args.data_dir)
+    print(f"Wrote {path} ({os.path.getsize(path)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Row and column summary statistics of the heatmap matrix.
+
+Every statistic of an axis comes out of one row-wise sort: the count of
+values, the mean, and the percentiles read off the sorted rows with the
+same linear interpolation as np.nanpercentile. The sorted rows are also
+laid end to end as one globally sorted key array, so the number of cells
+of every row inside the range slider is two np.searchsorted calls, without
+touching the matrix again.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .data_store import DerivedTables
+
+# Statistics of each entry (row, or column) of one axis.
+#   keys, low, span - search index for range_counts (see summarize)
+AxisSummary = namedtuple('AxisSummary', ['mean', 'median', 'p25', 'p75', 'count', 'keys', 'low', 'span'])
+
+MatrixSummary = namedtuple('MatrixSummary', ['version', 'rows', 'columns'])
+
+
+def percentile(ordered, count, q):
+    """q-th percentile of each row of a row-sorted matrix whose first count values are valid."""
+    position = np.maximum(count - 1, 0) * (q / 100)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.ceil(position).astype(np.intp)
+    low_values = np.take_along_axis(ordered, lower[:, None], axis=1)[:, 0]
+    high_values = np.take_along_axis(ordered, upper[:, None], axis=1)[:, 0]
+    result = low_values + (high_values - low_values) * (position - lower)
+    result[count == 0] = np.nan
+    return result
+
+
+def summarize(values):
+    """AxisSummary of every row of values (NaN = missing)."""
+    n_rows, n_cols = values.shape
+    ordered = np.sort(values, axis=1)  # NaN sorts last
+    count = np.count_nonzero(~np.isnan(ordered), axis=1)
+
+    if n_cols == 0:
+        nan = np.full(n_rows, np.nan)
+        return AxisSummary(nan, nan, nan, nan, count, np.zeros(0), 0.0, 1.0)
+
+    total = np.where(np.isnan(ordered), 0, ordered).sum(axis=1)
+    mean = np.divide(total, count, out=np.full(n_rows, np.nan), where=count > 0)
+
+    # Shift every row into its own band [row * span, row * span + span) so that the
+    # flattened rows are one sorted array; missing values sit past the last valid value
+    finite = ordered[~np.isnan(ordered)]
+    low = float(finite.min()) if finite.size else 0.0
+    span = (float(finite.max()) - low if finite.size else 0.0) + 1
+    keys = np.where(np.isnan(ordered), span - 0.5, ordered - low) + (np.arange(n_rows) * span)[:, None]
+
+    return AxisSummary(
+        mean,
+        percentile(ordered, count, 50),
+        percentile(ordered, count, 25),
+        percentile(ordered, count, 75),
+        count,
+        keys.ravel(),
+        low,
+        span,
+    )
+
+
+def range_counts(summary, value_range):
+    """Number of values of each entry inside [min, max] of the range slider."""
+    n = len(summary.count)
+    low = max(value_range[0] - summary.low, 0)
+    high = min(value_range[1] - summary.low, summary.span - 1)
+    if low > high:
+        return np.zeros(n, dtype=np.intp)
+    offsets = np.arange(n) * summary.span
+    return (np.searchsorted(summary.keys, offsets + high, side='right')
+            - np.searchsorted(summary.keys, offsets + low, side='left'))
+
+
+_summaries = DerivedTables(
+    lambda snapshot: MatrixSummary(snapshot.version, summarize(snapshot.matrix), summarize(snapshot.matrix.T)))
+
+
+def matrix_summary(snapshot):
+    """Row and column summaries of a snapshot's matrix, computed once per data version."""
+    return _summaries.get(snapshot)
+
+
+def marginal_data(summary, value_range, positions=None):
+    """(mean, customdata) of the marginal bars of one axis, optionally for a subset of entries.
+
+    customdata columns: median, 25th and 75th percentile, values inside the range, values.
+    Statistics are rounded to the two decimals shown on hover, which keeps the JSON short.
+    """
+    customdata = np.column_stack([
+        np.round(summary.median, 2), np.round(summary.p25, 2), np.round(summary.p75, 2),
+        range_counts(summary, value_range), summary.count,
+    ])
+    mean = np.round(summary.mean, 2)
+    if positions is not None:
+        mean, customdata = mean[positions], customdata[positions]
+    return mean, customdata
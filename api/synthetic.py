@@ -0,0 +1,94 @@
+"""Seeded synthetic datasets for load and benchmark runs.
+
+Generates a consistent example.json / measurement_map.json / TXT.json
+triple of arbitrary size: every catalog item points at a topic and domain
+that exist in the heatmap matrix, and the same seed always produces the
+same files.
+
+    python -m api.synthetic --out /tmp/skills-large --topics 2000 --domains 200 --items 50000
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+BEHAVIORS = ('התנהגות', 'עמדות', 'ידע')
+GRAPH_TYPES = ('bar', 'pie', 'scatter', 'line')
+
+
+def randomize_numeric(records, rng, low=0, high=10):
+    """Replace every integer value of a list of records with a random integer in [low, high].
+
+    rng is a numpy Generator; all values are drawn in one call.
+    """
+    slots = [(record, key) for record in records for key, value in record.items()
+             if isinstance(value, int) and not isinstance(value, bool)]
+    if not slots:
+        return records
+    for (record, key), value in zip(slots, rng.integers(low, high + 1, size=len(slots)).tolist()):
+        record[key] = value
+    return records
+
+
+def generate_dataset(topics, domains, items, answer_options=3, graph_types=GRAPH_TYPES, seed=0, max_value=20):
+    """Return (example, catalog, texts) record lists of the requested size."""
+    rng = np.random.default_rng(seed)
+    parents = [f"מאפיין {i}" for i in range(max(1, -(-topics // len(BEHAVIORS))))]
+    topic_names = [f"{parents[i // len(BEHAVIORS)]} {BEHAVIORS[i % len(BEHAVIORS)]}" for i in range(topics)]
+    domain_names = [f"תחום {i}" for i in range(domains)]
+
+    matrix = rng.integers(0, max_value + 1, size=(topics, domains)).tolist()
+    example = [{'נושא': topic, **dict(zip(domain_names, row))} for topic, row in zip(topic_names, matrix)]
+    texts = [{'נושא': topic, **dict.fromkeys(domain_names, f"טקסט {i}")} for i, topic in enumerate(topic_names)]
+
+    answers = '[' + ', '.join(f"תשובה {i + 1}" for i in range(answer_options)) + ']'
+    item_topics = rng.integers(0, topics, size=items).tolist()
+    item_domains = rng.integers(0, domains, size=items).tolist()
+    item_graphs = rng.integers(0, len(graph_types), size=items).tolist()
+    catalog = []
+    for i, (topic, domain, graph) in enumerate(zip(item_topics, item_domains, item_graphs)):
+        parent, behavior = topic_names[topic].rsplit(' ', 1)
+        catalog.append({
+            'תחום': domain_names[domain],
+            'מאפיין': parent,
+            'התנהגות / עמדות / ידע': behavior,
+            'סעיף / היגד על': f"היגד {i}",
+            'פריט/היגד מקורי': f"Survey item {i}",
+            'תשובות אפשריות': answers,
+            'מקור': 'Synthetic',
+            'קישור': '',
+            'גרף': graph_types[graph],
+        })
+    return example, catalog, texts
+
+
+def write_dataset(out_dir, topics, domains, items, **options):
+    """Generate a dataset and write its three JSON files into out_dir."""
+    example, catalog, texts = generate_dataset(topics, domains, items, **options)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, records in (('example.json', example), ('measurement_map.json', catalog), ('TXT.json', texts)):
+        with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+    return out_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic dashboard dataset.")
+    parser.add_argument('--out', required=True, help="output directory")
+    parser.add_argument('--topics', type=int, default=18, help="heatmap rows (default: %(default)s)")
+    parser.add_argument('--domains', type=int, default=10, help="heatmap columns (default: %(default)s)")
+    parser.add_argument('--items', type=int, default=130, help="catalog survey items (default: %(default)s)")
+    parser.add_argument('--answer-options', type=int, default=3, help="answer options per item (default: %(default)s)")
+    parser.add_argument('--graph-types', nargs='+', default=list(GRAPH_TYPES), help="chart types to draw from")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_dataset(args.out, args.topics, args.domains, args.items,
+                  answer_options=args.answer_options, graph_types=tuple(args.graph_types), seed=args.seed)
+    print(f"Wrote {args.topics}x{args.domains} matrix and {args.items} catalog items to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
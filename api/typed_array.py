@@ -0,0 +1,37 @@
+"""Plotly.js typed-array specs for numeric figure data.
+
+Plotly.js (>= 2.28) accepts a data array as `{dtype, bdata, shape}`: the raw
+little-endian buffer, base64-encoded. For a heatmap matrix this replaces a
+nested JSON list of numbers and nulls with one string that is cheaper to
+encode on the server and to parse in the browser. NaN values stay gaps.
+"""
+import base64
+
+import numpy as np
+
+# Plotly.js integer dtype codes, narrowest first
+INTEGER_TYPES = ('u1', 'i1', 'u2', 'i2', 'u4', 'i4')
+
+
+def encode(values):
+    """Return the typed-array spec of a numeric array, in the narrowest exact dtype.
+
+    Gap-free integer matrices (the raw survey scores) use the smallest integer
+    type that holds them; NaN gaps need float32, or float64 when float32
+    would round a value.
+    """
+    array = np.asarray(values, dtype=np.float64)
+    dtype = None
+    if array.size and np.isfinite(array).all() and (array == np.round(array)).all():
+        low, high = array.min(), array.max()
+        dtype = next((code for code in INTEGER_TYPES
+                      if np.iinfo(code).min <= low and high <= np.iinfo(code).max), None)
+    if dtype is None:
+        dtype = 'f4' if np.array_equal(array.astype('<f4'), array, equal_nan=True) else 'f8'
+    data = np.ascontiguousarray(array.astype('<' + dtype))
+    return {
+        'dtype': dtype,
+        'bdata': base64.b64encode(data.tobytes()).decode('ascii'),
+        'shape': ','.join(str(n) for n in array.shape),
+    }
+
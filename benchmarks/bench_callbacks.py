@@ -0,0 +1,226 @@
+"""Micro-benchmarks for the dashboard's callback hot paths.
+
+Calls the callback functions directly (no browser, no HTTP) against the
+real public/ data and synthetic datasets of growing size, and reports
+latency percentiles, peak allocations and serialized response size:
+
+    python -m benchmarks.bench_callbacks                     # all scales
+    python -m benchmarks.bench_callbacks --scales current medium
+    python -m benchmarks.bench_callbacks --save-baseline     # refresh baseline.json
+    python -m benchmarks.bench_callbacks --compare           # diff against baseline.json
+
+Every scale runs in its own interpreter with SKILLS_DATA_DIR pointing at
+the dataset, because figures_map loads the catalog at import time.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from api.synthetic import write_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# name -> (topics, domains, catalog items); None means the shipped public/ data
+SCALES = {
+    'current': None,
+    'medium': (200, 50, 5000),
+    'large': (2000, 200, 50000),
+}
+
+IMPORT_REPEATS = 3
+
+
+def summarize(samples, sizes=None, peaks=None):
+    samples = sorted(samples)
+    quantiles = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    result = {
+        'n': len(samples),
+        'p50_ms': quantiles[49] * 1000,
+        'p90_ms': quantiles[89] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+        'max_ms': samples[-1] * 1000,
+    }
+    if sizes:
+        result['bytes'] = int(statistics.median(sizes))
+    if peaks:
+        result['peak_kib'] = statistics.median(peaks) / 1024
+    return result
+
+
+def measure(func, args_list, size_of=None, before=None):
+    """Time func over args_list, then repeat under tracemalloc for peak allocations."""
+    samples, sizes, peaks = [], [], []
+    for args in args_list:
+        if before:
+            before()
+        start = time.perf_counter()
+        result = func(*args)
+        samples.append(time.perf_counter() - start)
+        if size_of:
+            sizes.append(size_of(result))
+    for args in args_list[:min(len(args_list), 20)]:
+        if before:
+            before()
+        tracemalloc.start()
+        func(*args)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return summarize(samples, sizes, peaks)
+
+
+def json_encoded(index, func):
+    """Run func with the heatmap z serialized as nested lists instead of a typed array."""
+    def wrapper(*args):
+        encoding, index.HEATMAP_Z_ENCODING = index.HEATMAP_Z_ENCODING, 'json'
+        try:
+            return func(*args)
+        finally:
+            index.HEATMAP_Z_ENCODING = encoding
+    return wrapper
+
+
+def run_worker(iterations):
+    """Benchmark the callbacks in this process against SKILLS_DATA_DIR."""
+    import api.figures_map as figures_map
+    import plotly.utils
+    import api.index as index
+    from api import metrics
+    logging.disable(logging.CRITICAL)
+
+    def payload_size(value):
+        return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder))
+
+    snapshot = index.store.table('example.json')
+    labels = index.label_table(snapshot)
+    columns = list(snapshot.columns)
+    rng = random.Random(1)
+
+    default_view = ([], [0, 100], 'Reds', {'width': 1400, 'height': 900})
+    varied_views = [
+        (rng.sample(columns, rng.randint(1, len(columns))), [0, rng.randint(5, 100)], rng.choice(['Reds', 'R', 'Blues']),
+         {'width': rng.randint(800, 2000), 'height': rng.randint(600, 1200)})
+        for _ in range(iterations)
+    ]
+    # Click only cells that have catalog entries, so the cold path really builds figures
+    x_by_key = {key: label for label, key in labels.x_keys.items()}
+    y_by_key = {key: label for label, key in labels.y_keys.items()}
+    cells = [
+        (x_by_key[domain], y_by_key[metric])
+        for domain, metrics in figures_map.cell_items.items() if domain in x_by_key
+        for metric in metrics if metric in y_by_key
+    ]
+    clicks = [({'points': [{'x': x, 'y': y}]},) for x, y in rng.choices(cells, k=iterations)]
+
+    results = {
+        'update_heatmap_cold': measure(index.update_heatmap, varied_views, payload_size, index.heatmap_cache.clear),
+        'update_heatmap_warm': measure(index.update_heatmap, [default_view] * iterations, payload_size),
+        # Same views with z as nested JSON lists (HEATMAP_Z_ENCODING=json), for the payload comparison
+        'update_heatmap_cold_json': measure(json_encoded(index, index.update_heatmap), varied_views, payload_size,
+                                            index.heatmap_cache.clear),
+        'update_checklist_options': measure(index.update_checklist_options, [(1, None)] * iterations, payload_size),
+        'update_modal_content_cold': measure(index.update_modal_content_helper, clicks, payload_size, figures_map.figure_map.cache_clear),
+        'update_modal_content_warm': measure(index.update_modal_content_helper, [clicks[0]] * iterations, payload_size),
+    }
+    # A failing heatmap (unknown dataset) is answered with an error figure; it must still be counted
+    failures = metrics.callback_exceptions.value('update_heatmap')
+    error_view = default_view + ('leaf', 'mean', None, 'no-such-dataset')
+    # (wrapped like its Dash registration, which is what counts exceptions)
+    results['update_heatmap_error'] = measure(metrics.instrumented(index.update_heatmap), [error_view] * iterations,
+                                              payload_size)
+    counted = metrics.callback_exceptions.value('update_heatmap') - failures
+    if counted < iterations:
+        raise AssertionError(f"{iterations} heatmap failures, {counted} in dash_callback_exceptions_total")
+    results['matrix'] = list(snapshot.matrix.shape)
+    results['catalog_items'] = sum(len(items) for row in figures_map.cell_items.values() for items in row.values())
+    return results
+
+
+def run_import_only():
+    start = time.perf_counter()
+    import api.figures_map  # noqa: F401
+    return time.perf_counter() - start
+
+
+def run_scale(scale, iterations):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        if SCALES[scale] is None:
+            env['SKILLS_DATA_DIR'] = os.path.join(ROOT, 'public')
+        else:
+            write_dataset(tmp, *SCALES[scale])
+            env['SKILLS_DATA_DIR'] = tmp
+
+        def worker(*args):
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_callbacks', '--worker', *args],
+                cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+            )
+            return json.loads(output.stdout.strip().splitlines()[-1])
+
+        results = worker('--iterations', str(iterations))
+        # Import time is a one-shot number per process: sample it across fresh interpreters
+        import_samples = [worker('--import-only') for _ in range(IMPORT_REPEATS)]
+        results['import_figures_map'] = summarize(import_samples)
+    return results
+
+
+def print_report(report, baseline=None):
+    for scale, results in report.items():
+        print(f"\n== {scale}: matrix {results['matrix'][0]}x{results['matrix'][1]}, {results['catalog_items']} catalog items")
+        print(f"{'benchmark':<28}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak KiB':>11}{'bytes':>11}{'vs base':>10}")
+        for name, stats in results.items():
+            if not isinstance(stats, dict):
+                continue
+            line = f"{name:<28}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+            line += f"{stats['peak_kib']:>11.1f}" if 'peak_kib' in stats else f"{'':>11}"
+            line += f"{stats['bytes']:>11}" if 'bytes' in stats else f"{'':>11}"
+            base = (baseline or {}).get(scale, {}).get(name)
+            if base:
+                line += f"{stats['p50_ms'] / base['p50_ms']:>9.2f}x"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as benchmarks/baseline.json")
+    parser.add_argument('--compare', action='store_true', help="show p50 relative to benchmarks/baseline.json")
+    parser.add_argument('--output', help="also write the raw results to this JSON file")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--import-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = run_import_only() if args.import_only else run_worker(args.iterations)
+        print(json.dumps(result))
+        return 0
+
+    report = {scale: run_scale(scale, args.iterations) for scale in args.scales}
+    baseline = None
+    if args.compare and os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Memory of the catalog items: parsed dicts vs. compact CatalogItem records.
+
+Builds the catalog items and their cell index at growing catalog sizes in
+both layouts and reports how much they add to the process:
+
+    python -m benchmarks.bench_catalog_memory
+    python -m benchmarks.bench_catalog_memory --scales 130 10k
+
+  dicts    - the previous layout: every parsed item dict, copied with an
+             added combined_metric string
+  records  - CatalogItem records with the catalog's strings interned, as
+             build_catalog loads them
+
+Every measurement runs in a fresh interpreter. RSS growth is read from
+/proc (Linux) in one run; allocations still alive once the catalog is
+built are counted by tracemalloc in another run, since tracing inflates RSS.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from api.synthetic import write_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (topics, domains, catalog items); None means the shipped public/ data
+SCALES = {
+    '130': None,
+    '10k': (200, 50, 10000),
+    '100k': (2000, 200, 100000),
+}
+LAYOUTS = ('dicts', 'records')
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def dict_items(records):
+    """Catalog items as build_catalog kept them before CatalogItem."""
+    return [
+        {**item, 'combined_metric': item['מאפיין'] + " - " + item['התנהגות / עמדות / ידע']}
+        for item in records
+    ]
+
+
+def build_items(data_dir, layout):
+    """(items, cell index) of the catalog of data_dir in the given layout."""
+    import numpy as np
+    from api.figures_map import MOCK_SEED, build_catalog, build_catalog_index, load_catalog
+    from api.synthetic import randomize_numeric
+
+    if layout == 'records':
+        catalog = build_catalog(data_dir)
+        return catalog.data, catalog.cell_items
+    items = dict_items(randomize_numeric(load_catalog(data_dir), np.random.default_rng(MOCK_SEED)))
+    return items, build_catalog_index(items)
+
+
+def run_worker(data_dir, layout, traced):
+    import api.figures_map  # noqa: F401  (loads the default catalog before the baseline is taken)
+
+    gc.collect()
+    if traced:
+        tracemalloc.start()
+    before = current_rss()
+    catalog = build_items(data_dir, layout)
+    gc.collect()
+    result = {'items': len(catalog[0]), 'rss_bytes': current_rss() - before}
+    if traced:
+        result['traced_bytes'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return result
+
+
+def run_scale(scale):
+    env = dict(os.environ, PYTHONPATH=ROOT, SKILLS_DATA_DIR=os.path.join(ROOT, 'public'))
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(ROOT, 'public') if SCALES[scale] is None else write_dataset(tmp, *SCALES[scale])
+
+        def worker(layout, traced):
+            args = [sys.executable, '-m', 'benchmarks.bench_catalog_memory', '--worker', data_dir, layout]
+            output = subprocess.run(args + (['--traced'] if traced else []),
+                                    cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+            return json.loads(output.stdout.strip().splitlines()[-1])
+
+        results = {}
+        for layout in LAYOUTS:
+            results[layout] = worker(layout, traced=False)
+            results[layout]['traced_bytes'] = worker(layout, traced=True)['traced_bytes']
+    return results
+
+
+def print_report(report):
+    mib = 1024 * 1024
+    print(f"{'items':>8}  {'layout':<9}{'RSS MiB':>10}{'traced MiB':>12}{'B/item':>9}{'vs dicts':>10}")
+    for results in report.values():
+        for layout in LAYOUTS:
+            stats = results[layout]
+            ratio = stats['traced_bytes'] / results['dicts']['traced_bytes']
+            print(f"{stats['items']:>8}  {layout:<9}{stats['rss_bytes'] / mib:>10.2f}{stats['traced_bytes'] / mib:>12.2f}"
+                  f"{stats['traced_bytes'] // stats['items']:>9}{ratio:>9.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--output', help="also write the raw results to this JSON file")
+    parser.add_argument('--worker', nargs=2, metavar=('DATA_DIR', 'LAYOUT'), help=argparse.SUPPRESS)
+    parser.add_argument('--traced', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(*args.worker, traced=args.traced)))
+        return 0
+
+    report = {scale: run_scale(scale) for scale in args.scales}
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Cold-load time of the data files: compiled snapshot vs. the JSON fallback.
+
+Loads the heatmap table (parse_table) and the catalog records
+(load_catalog) of the same dataset twice, once from a directory holding
+only the JSON files and once from a copy with a compiled data.snapshot,
+and reports the median of several runs:
+
+    python -m benchmarks.bench_snapshot
+    python -m benchmarks.bench_snapshot --scales current large
+
+Every run forgets the loaded snapshot first, so mapping the file, reading
+its header and checking freshness are included, as on a worker's first
+request.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from api.data_store import file_version, parse_table
+from api.figures_map import load_catalog
+from api.snapshot import SOURCE_FILES, compile_snapshot, forget_snapshot
+from api.synthetic import write_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (topics, domains, catalog items); None means the shipped public/ data
+SCALES = {
+    'current': None,
+    'medium': (200, 50, 5000),
+    'large': (2000, 200, 50000),
+}
+REPEATS = 7
+
+
+def load_table(data_dir):
+    path = os.path.join(data_dir, 'example.json')
+    return parse_table('example.json', path, 'נושא', file_version(path))
+
+
+def same_table(a, b):
+    return (list(a.columns) == list(b.columns) and dict(a.columns) == dict(b.columns) and a.index == b.index
+            and np.array_equal(a.matrix, b.matrix))
+
+
+def timed(func, data_dir, repeats):
+    samples = []
+    for _ in range(repeats):
+        forget_snapshot(data_dir)
+        start = time.perf_counter()
+        func(data_dir)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run_scale(scale, repeats):
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = os.path.join(tmp, 'json')
+        if SCALES[scale] is None:
+            os.makedirs(json_dir)
+            for name in SOURCE_FILES:
+                shutil.copy2(os.path.join(ROOT, 'public', name), json_dir)
+        else:
+            write_dataset(json_dir, *SCALES[scale])
+        compiled_dir = shutil.copytree(json_dir, os.path.join(tmp, 'compiled'))
+        compile_snapshot(compiled_dir)
+
+        # Both paths must produce the same data
+        assert same_table(load_table(json_dir), load_table(compiled_dir))
+        assert load_catalog(json_dir) == load_catalog(compiled_dir)
+
+        results = {}
+        for label, func in (('table', load_table), ('catalog', load_catalog)):
+            results[label] = {
+                'json_ms': timed(func, json_dir, repeats),
+                'snapshot_ms': timed(func, compiled_dir, repeats),
+            }
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--output', help="also write the raw results to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = {}
+    print(f"{'scale':<9}{'file':<9}{'JSON ms':>10}{'snapshot ms':>13}{'speedup':>9}")
+    for scale in args.scales:
+        report[scale] = run_scale(scale, args.repeats)
+        for label, stats in report[scale].items():
+            print(f"{scale:<9}{label:<9}{stats['json_ms']:>10.2f}{stats['snapshot_ms']:>13.2f}"
+                  f"{stats['json_ms'] / stats['snapshot_ms']:>8.2f}x")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
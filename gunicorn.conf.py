@@ -0,0 +1,92 @@
+"""Production server configuration.
+
+    gunicorn                      # picks up this file from the working directory
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) and workers are forked
+from it, so the parsed tables, label tables and catalog are shared
+copy-on-write instead of being rebuilt per worker:
+
+  * the data matrices of files over SNAPSHOT_MIN_BYTES are memory-mapped
+    from the compiled snapshot, which is (re)compiled here before the app is
+    imported, so their pages live in the page cache and are shared by every
+    worker and by the master;
+  * the garbage collector is disabled while the app is preloaded and every
+    object allocated so far is frozen right before forking, so collections
+    in the workers never write to the master's pages.
+
+Only the default dataset is preloaded. The other datasets under
+SKILLS_DATASETS_DIR (see api/datasets.py) are loaded by each worker on
+first use. DATASET_MEMORY_BUDGET applies to each worker separately.
+
+Worker model, from the environment:
+
+    WEB_CONCURRENCY         number of worker processes (default: CPU count)
+    GUNICORN_WORKER_CLASS   gthread (default) or gevent (needs the gevent package)
+    GUNICORN_THREADS        threads per gthread worker (default 4)
+    PORT                    listen port (default 8051)
+
+Logging defaults to the production setup here: LOG_MODE=async (queued INFO
+records, quiet werkzeug/dash loggers; see api/log_config.py) unless LOG_MODE
+is set.
+
+Background threads (async log writer, data watcher) do not survive fork;
+they are restarted in every worker once it is initialized, i.e. after
+gevent has patched threading. The master stops its own watcher and log
+writer before the first fork, and a worker's watcher picks up any file
+changed since.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+
+# Before the app is imported: production logs through the async queue, not DEBUG to stderr
+os.environ.setdefault('LOG_MODE', 'async')
+
+from api.data_store import DATA_DIR  # noqa: E402
+from api.snapshot import SOURCE_FILES, compile_snapshot, load_snapshot  # noqa: E402
+
+wsgi_app = 'api.index:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', 8051)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = 60
+accesslog = '-'
+
+# Avoid freed holes in the pages the workers will share (see gc.freeze)
+gc.disable()
+
+try:
+    compiled = load_snapshot(DATA_DIR)
+    if compiled is None or not all(compiled.is_fresh(name, DATA_DIR) for name in SOURCE_FILES):
+        compile_snapshot(DATA_DIR)
+except (OSError, ValueError) as e:
+    logging.warning(f"Serving from JSON, could not compile the data snapshot: {e}")
+
+
+def when_ready(server):
+    from api import index
+    from api.log_config import configure_logging
+
+    # Build everything derived from the data once, in the master
+    index.warm_derived_tables(())
+    # No master thread may hold a data lock at fork time; workers run their own watchers
+    index.watcher.stop()
+    # Nor the stream lock: the master only supervises from here on and writes its few records inline
+    configure_logging('sync')
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    from api import index
+    from api.log_config import configure_logging
+
+    configure_logging()
+    index.watcher.start()